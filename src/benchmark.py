@@ -0,0 +1,451 @@
+import argparse
+import os
+import time
+from fractions import Fraction
+import numpy as np
+import scipy.signal
+from capturer import read_wav
+import config
+from config import DEFAULT_CONFIG
+
+SAMPLE_RATE = 16000
+
+def synthetic_clips(count, duration, channels, seed=0):
+    # Deterministic tone/noise mixtures so runs are comparable across machines
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SAMPLE_RATE * duration)) / SAMPLE_RATE
+    clips = []
+    for _ in range(count):
+        clip = np.zeros((len(t), channels), dtype=np.float32)
+        for ch in range(channels):
+            freq = rng.uniform(100, 4000)
+            clip[:, ch] = 0.3 * np.sin(2 * np.pi * freq * t) + 0.05 * rng.standard_normal(len(t))
+        clips.append(clip)
+    return clips
+
+def read_wav_resampled(path):
+    # WAV file as float32 [frames, channels] at SAMPLE_RATE
+    data, rate = read_wav(path)
+    if rate != SAMPLE_RATE:
+        ratio = Fraction(SAMPLE_RATE, rate)
+        data = scipy.signal.resample_poly(data, ratio.numerator, ratio.denominator, axis=0).astype(np.float32)
+    return data
+
+def load_clips(clip_dir, duration, channels, limit):
+    # Cut every WAV in clip_dir into consecutive chunk-length clips
+    num_frames = int(SAMPLE_RATE * duration)
+    clips = []
+    for name in sorted(os.listdir(clip_dir)):
+        if not name.lower().endswith(".wav"):
+            continue
+        data = read_wav_resampled(os.path.join(clip_dir, name))
+        data = data[:, np.arange(channels) % data.shape[1]]
+        for start in range(0, len(data) - num_frames + 1, num_frames):
+            clips.append(np.ascontiguousarray(data[start:start + num_frames]))
+    return clips[:limit]
+
+def get_clips(args):
+    if args.clips:
+        clips = load_clips(args.clips, args.duration, args.channels, args.runs)
+        if clips:
+            return clips
+        print(f"No usable WAV clips in {args.clips}. Using synthetic clips.")
+    return synthetic_clips(args.runs, args.duration, args.channels)
+
+def add_clip_arguments(parser, channels=2):
+    parser.add_argument("--clips", help="Directory of WAV files to use instead of synthetic clips")
+    parser.add_argument("--duration", type=float, default=1.0, help="Chunk length in seconds")
+    parser.add_argument("--channels", type=int, default=channels)
+    parser.add_argument("--runs", type=int, default=20, help="Number of chunks")
+    parser.add_argument("--top-k", type=int, default=3)
+
+def top1_agreement(reference, outputs):
+    total = matches = 0
+    for ref_chunk, out_chunk in zip(reference, outputs):
+        for ref, out in zip(ref_chunk, out_chunk):
+            total += 1
+            if ref and out and ref[0][0] == out[0][0]:
+                matches += 1
+    return matches, total
+
+def topk_overlap(reference, outputs):
+    overlaps = []
+    for ref_chunk, out_chunk in zip(reference, outputs):
+        for ref, out in zip(ref_chunk, out_chunk):
+            if ref:
+                overlaps.append(len({n for n, _ in ref} & {n for n, _ in out}) / len(ref))
+    return np.mean(overlaps) if overlaps else 0.0
+
+def percentile_ms(values, q):
+    return np.percentile(values, q) * 1000 if values else 0.0
+
+def print_latency(name, latencies):
+    print(f"{name:<12} mean {np.mean(latencies)*1000:8.1f} ms | p50 {percentile_ms(latencies, 50):8.1f} ms | p95 {percentile_ms(latencies, 95):8.1f} ms")
+
+def print_stage_times(stage_times):
+    # stage -> list of (wall, cpu) seconds
+    print(f"{'stage':<12} {'wall ms':>9} {'cpu ms':>9}")
+    for stage, samples in stage_times.items():
+        wall, cpu = np.mean(samples, axis=0) * 1000
+        print(f"{stage:<12} {wall:9.2f} {cpu:9.2f}")
+
+def bench_pipeline(args):
+    from transformers import pipeline
+    from classifier import AudioClassifier, get_model_source
+
+    classifier = AudioClassifier(use_gpu=False)
+    pipe = pipeline("audio-classification", model=get_model_source(), device=-1)
+    clips = get_clips(args)
+
+    # Warm-up both paths once
+    classifier.predict_batch(clips[0], top_k=args.top_k)
+    pipe(clips[0][:, 0], top_k=args.top_k)
+
+    pipe_latencies = []
+    direct_latencies = []
+    matches = 0
+    for clip in clips:
+        start = time.perf_counter()
+        pipe_top = [pipe(np.ascontiguousarray(clip[:, ch]), top_k=args.top_k)[0]['label'] for ch in range(args.channels)]
+        pipe_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        results, _ = classifier.predict_batch(clip, top_k=args.top_k)
+        direct_latencies.append(time.perf_counter() - start)
+
+        matches += sum(1 for label, res in zip(pipe_top, results) if res and res[0][0] == label)
+
+    print(f"\n{len(clips)} chunks of {args.duration:.2f}s x {args.channels} channels on CPU")
+    print_latency("pipeline", pipe_latencies)
+    print_latency("direct", direct_latencies)
+    print(f"Top-1 agreement: {matches}/{len(clips) * args.channels}")
+
+def run_classifier(classifier, clips, top_k):
+    # Warm-up once, then time predict_batch per clip
+    classifier.predict_batch(clips[0], top_k=top_k)
+    latencies = []
+    outputs = []
+    for clip in clips:
+        start = time.perf_counter()
+        results, _ = classifier.predict_batch(clip, top_k=top_k)
+        latencies.append(time.perf_counter() - start)
+        outputs.append(results)
+    return latencies, outputs
+
+def bench_precision(args):
+    from classifier import AudioClassifier
+
+    clips = get_clips(args)
+    reference = None
+    rows = []
+    for precision in args.modes:
+        classifier = AudioClassifier(use_gpu=False, precision=precision)
+        latencies, outputs = run_classifier(classifier, clips, args.top_k)
+
+        # The first mode is the accuracy reference
+        if reference is None:
+            reference = outputs
+        matches, total = top1_agreement(reference, outputs)
+        rows.append((precision, latencies, matches, total, topk_overlap(reference, outputs)))
+
+    print(f"\n{len(clips)} chunks of {args.duration:.2f}s x {args.channels} channels on CPU (reference: {args.modes[0]})")
+    for precision, latencies, matches, total, overlap in rows:
+        print_latency(precision, latencies)
+        print(f"{'':<12} top-1 agreement {matches}/{total} | top-{args.top_k} overlap {overlap*100:.1f}%")
+
+def bench_stream(args):
+    from capturer import AudioCapturer, ReplaySource
+    from classifier import AudioClassifier
+    from channel_map import get_channel_map
+    from engine import ProcessingEngine, StageTimer, format_labels
+
+    if args.wav:
+        source = ReplaySource.from_wav(args.wav, realtime=args.realtime, loop=False)
+    elif args.source == "tone":
+        freqs = np.geomspace(220, 3520, args.channels)
+        source = ReplaySource.tone(freqs, duration=args.seconds, realtime=args.realtime, loop=False)
+    elif args.source == "mono":
+        source = ReplaySource.noise(1, duration=args.seconds, realtime=args.realtime, loop=False)
+        source.data = source.data * np.linspace(1.0, 0.5, args.channels, dtype=np.float32)
+        source.channels = args.channels
+    else:
+        source = ReplaySource.noise(args.channels, duration=args.seconds, realtime=args.realtime, loop=False)
+
+    cfg = DEFAULT_CONFIG.copy()
+    cfg.update({
+        "chunk_duration": args.duration,
+        "hop_duration": args.hop,
+        "precision": args.precision,
+        "change_threshold_db": args.change_threshold,
+        "group_threshold": args.group_threshold,
+        "use_gpu": False,
+        "show_debug": True,
+        "enable_radar": True,
+        "normalization_threshold": 0.0, # Process every chunk, even quiet ones
+    })
+
+    capturer = AudioCapturer(chunk_duration=args.duration, hop_duration=args.hop, capture_rate=args.capture_rate, source=source)
+    classifier = AudioClassifier(use_gpu=False, precision=args.precision, backend=args.backend)
+    classifier.warmup(int(capturer.target_sr * args.duration), channels=source.channels)
+
+    # Same engine the GUI worker uses, driven synchronously without Qt
+    engine = ProcessingEngine(classifier)
+
+    latencies = []
+    stage_times = {}
+    skipped = np.zeros(source.channels) # per channel: silent or reused, no inference
+    processed = 0
+    chunks = capturer.capture_loop()
+    start = time.perf_counter()
+    while True:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        capture_time = (time.perf_counter() - wall, time.process_time() - cpu)
+
+        chunk_start = time.perf_counter()
+        detections = engine.process(chunk, cfg)
+        timer = StageTimer()
+        if detections is not None:
+            format_labels(detections)
+        timer.lap("format")
+        latencies.append(time.perf_counter() - chunk_start)
+
+        stage_times.setdefault("capture", []).append(capture_time)
+        if detections is not None:
+            for stage, times in {**detections.stage_times, **timer.times}.items():
+                stage_times.setdefault(stage, []).append(times)
+            skipped += detections.silent | detections.reused
+            processed += 1
+    elapsed = time.perf_counter() - start
+
+    pace = "real-time" if args.realtime else "as fast as possible"
+    print(f"\n{len(latencies)} chunks of {args.duration:.2f}s x {source.channels} channels from {source.name} ({capturer.capture_path}, {pace})")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} chunks/s")
+    print(f"Latency:    p50 {percentile_ms(latencies, 50):.1f} ms | p95 {percentile_ms(latencies, 95):.1f} ms | p99 {percentile_ms(latencies, 99):.1f} ms")
+    print_stage_times(stage_times)
+    if processed:
+        mapped = get_channel_map(source.channels, cfg["channel_map"]).indices
+        per_channel = " ".join(f"{ch}:{skipped[ch] / processed * 100:.0f}%" for ch in mapped)
+        print(f"Skipped inferences: {engine.skip_ratio*100:.1f}% of mapped channels (per channel {per_channel})")
+        print(f"Grouped channels:   {classifier.group_ratio*100:.1f}% of classified channels")
+        if engine.downmixed_count:
+            print(f"Downmixed channels: {engine.downmix_ratio*100:.1f}% of mapped channels (shared one model input)")
+
+def bench_onnx(args):
+    from classifier import AudioClassifier
+
+    clips = get_clips(args)
+    runs = [("pytorch", "fp32", 0)] + [("onnxruntime", precision, threads) for precision in args.precisions for threads in args.threads]
+    reference = None
+    rows = []
+    for backend, precision, threads in runs:
+        classifier = AudioClassifier(use_gpu=False, precision=precision, backend=backend, intra_op_threads=threads)
+        if classifier.backend != backend or classifier.precision != precision:
+            print(f"Skipping {backend} {precision}: not available")
+            continue
+        latencies, outputs = run_classifier(classifier, clips, args.top_k)
+
+        # PyTorch fp32 is the label reference
+        if reference is None:
+            reference = outputs
+        matches, total = top1_agreement(reference, outputs)
+        name = backend if backend == "pytorch" else f"ort {precision} ({threads or 'auto'} threads)"
+        rows.append((name, latencies, matches, total, topk_overlap(reference, outputs)))
+
+    print(f"\n{len(clips)} chunks of {args.duration:.2f}s x {args.channels} channels on CPU (reference: pytorch fp32)")
+    for name, latencies, matches, total, overlap in rows:
+        print_latency(name, latencies)
+        print(f"{'':<12} top-1 agreement {matches}/{total} | top-{args.top_k} overlap {overlap*100:.1f}%")
+
+def bench_frames(args):
+    from classifier import AudioClassifier
+
+    clips = get_clips(args)
+    runs = [(0, "crop")] + [(frames, mode) for frames in args.frames for mode in args.pos_embed]
+    reference = None
+    rows = []
+    for frames, mode in runs:
+        classifier = AudioClassifier(use_gpu=False, precision=args.precision, max_frames=frames, pos_embed_mode=mode)
+        latencies, outputs = run_classifier(classifier, clips, args.top_k)
+
+        # Padded full-length input is the accuracy reference
+        if reference is None:
+            reference = outputs
+        matches, total = top1_agreement(reference, outputs)
+        name = "padded" if frames == 0 else f"{frames} {mode}"
+        rows.append((name, latencies, matches, total, topk_overlap(reference, outputs)))
+
+    print(f"\n{len(clips)} chunks of {args.duration:.2f}s x {args.channels} channels on CPU ({args.precision}, reference: padded to full length)")
+    for name, latencies, matches, total, overlap in rows:
+        print_latency(name, latencies)
+        print(f"{'':<12} top-1 agreement {matches}/{total} | top-{args.top_k} overlap {overlap*100:.1f}%")
+
+def bench_threads(args):
+    import torch
+    from classifier import AudioClassifier
+
+    # Model settings and chunk length come from the saved configuration
+    cfg = config.load_config()
+    if args.duration is None:
+        args.duration = cfg["chunk_duration"]
+    clips = get_clips(args)
+    counts = args.threads or sorted({2 ** i for i in range(int(np.log2(os.cpu_count() or 1)) + 1)} | {os.cpu_count() or 1})
+    options = dict(
+        use_gpu=False,
+        precision=cfg.get("precision", "fp32"),
+        backend=cfg.get("backend", "pytorch"),
+        max_frames=cfg.get("max_frames", 0),
+        pos_embed_mode=cfg.get("pos_embed_mode", "crop"),
+        inter_op_threads=cfg.get("inter_op_threads", 0),
+        cpu_affinity=cfg.get("cpu_affinity", []),
+    )
+
+    classifier = None
+    rows = []
+    for threads in counts:
+        if options["backend"] == "onnxruntime" or classifier is None:
+            # onnxruntime fixes the thread count per session; PyTorch can change it in place
+            classifier = AudioClassifier(intra_op_threads=threads, **options)
+        torch.set_num_threads(threads)
+        cpu_start = time.process_time()
+        latencies, _ = run_classifier(classifier, clips, args.top_k)
+        cpu_ms = (time.process_time() - cpu_start) / (len(clips) + 1) * 1000
+        rows.append((threads, latencies, cpu_ms))
+
+    print(f"\n{len(clips)} chunks of {args.duration:.2f}s x {args.channels} channels ({classifier.backend}, {classifier.precision}, {classifier.feature_extractor.max_length} frames) on {os.cpu_count()} CPUs")
+    for threads, latencies, cpu_ms in rows:
+        print_latency(f"{threads} threads", latencies)
+        print(f"{'':<12} CPU time {cpu_ms:.1f} ms per chunk")
+
+def pan_to_angle(source, angle, channel_map, bed_level, rng):
+    # Constant-power pan of a mono source between the two mapped speakers around angle,
+    # plus a low diffuse noise bed on every channel
+    frames = len(source)
+    chunk = bed_level * rng.standard_normal((frames, channel_map.channels)).astype(np.float32)
+    order = np.argsort(channel_map.angle_array)
+    speakers = channel_map.angle_array[order]
+    for i in range(len(speakers)):
+        a, b = speakers[i], speakers[(i + 1) % len(speakers)]
+        span = (b - a) % 360 or 360
+        offset = (angle - a) % 360
+        if offset <= span:
+            frac = offset / span
+            chunk[:, channel_map.indices[order[i]]] += np.cos(frac * np.pi / 2) * source
+            chunk[:, channel_map.indices[order[(i + 1) % len(speakers)]]] += np.sin(frac * np.pi / 2) * source
+            return chunk
+    return chunk
+
+def angle_error(a, b):
+    return abs((a - b + 180) % 360 - 180)
+
+def bench_localize(args):
+    from channel_map import get_channel_map, ANALYSIS_MODES
+    from classifier import AudioClassifier
+    from engine import ProcessingEngine
+
+    if args.channels <= 2:
+        print("Localization comparison needs a surround layout (--channels 6 or 8).")
+        return
+
+    rng = np.random.default_rng(0)
+    channel_map = get_channel_map(args.channels, args.map)
+    sources = [clip[:, 0] for clip in get_clips(argparse.Namespace(clips=args.clips, duration=args.duration, channels=1, runs=args.runs))]
+    scenes = [(rng.uniform(-180, 180), source) for source in sources]
+
+    classifier = AudioClassifier(use_gpu=False)
+    classifier.warmup(len(sources[0]), channels=args.channels)
+
+    cfg = DEFAULT_CONFIG.copy()
+    cfg.update({
+        "channel_map": args.map,
+        "top_k": args.top_k,
+        "change_threshold_db": 0.0, # every chunk runs the model
+        "normalization_threshold": 0.0,
+        "confidence_threshold": 0.0, # localize whatever the model ranks first
+        "enable_radar": True,
+    })
+
+    print(f"\n{len(scenes)} panned scenes of {args.duration:.2f}s on {args.channels} channels ({args.map}) on CPU")
+    for mode in ANALYSIS_MODES:
+        cfg["analysis_mode"] = mode
+        errors = []
+        latencies = []
+        for angle, source in scenes:
+            chunk = pan_to_angle(source, angle, channel_map, args.bed, rng)
+            # Fresh engine per scene so smoothing and templates don't carry over
+            engine = ProcessingEngine(classifier)
+            start = time.perf_counter()
+            detections = engine.process(chunk, cfg)
+            latencies.append(time.perf_counter() - start)
+            if detections is not None and detections.radar_dots:
+                estimate = max(detections.radar_dots, key=lambda dot: dot[1])[0]
+                errors.append(angle_error(estimate, angle))
+        model_inputs = engine.inferred_count
+        print_latency(mode, latencies)
+        print(f"{'':<12} direction error mean {np.mean(errors):.1f} deg | median {np.median(errors):.1f} deg | model inputs/chunk {model_inputs}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sound Assistant benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="Compare the transformers pipeline with the direct inference path on CPU")
+    add_clip_arguments(pipeline_parser)
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    precision_parser = subparsers.add_parser("precision", help="Compare accuracy and latency of the precision modes on CPU")
+    add_clip_arguments(precision_parser, channels=1)
+    precision_parser.add_argument("--modes", nargs="+", default=["fp32", "bf16", "int8-dynamic"], help="First mode is the reference")
+    precision_parser.set_defaults(func=bench_precision)
+
+    onnx_parser = subparsers.add_parser("onnx", help="Compare the onnxruntime backend with PyTorch on CPU (labels and latency)")
+    add_clip_arguments(onnx_parser)
+    onnx_parser.add_argument("--precisions", nargs="+", default=["fp32", "int8-dynamic"], help="ONNX graphs to test (fp32 = model.onnx, int8-dynamic = model-int8.onnx)")
+    onnx_parser.add_argument("--threads", type=int, nargs="+", default=[0], help="intra-op thread counts to sweep (0 = onnxruntime default)")
+    onnx_parser.set_defaults(func=bench_onnx)
+
+    frames_parser = subparsers.add_parser("frames", help="Compare shortened model inputs with the padded full-length input on CPU")
+    add_clip_arguments(frames_parser)
+    frames_parser.add_argument("--frames", type=int, nargs="+", default=[128, 304], help="Model input lengths to test (must cover the chunk: ~100 frames per second)")
+    frames_parser.add_argument("--pos-embed", nargs="+", choices=["crop", "interpolate"], default=["crop", "interpolate"])
+    frames_parser.add_argument("--precision", default="fp32")
+    frames_parser.set_defaults(func=bench_frames)
+
+    threads_parser = subparsers.add_parser("threads", help="Latency vs. intra-op thread count for the configured chunk length and model settings")
+    add_clip_arguments(threads_parser)
+    threads_parser.set_defaults(duration=None) # from config.json
+    threads_parser.add_argument("--threads", type=int, nargs="+", help="Thread counts to test (default: powers of two up to the CPU count)")
+    threads_parser.set_defaults(func=bench_threads)
+
+    stream_parser = subparsers.add_parser("stream", help="Replay a WAV file or synthetic signal through the full processing path")
+    stream_parser.add_argument("--wav", help="WAV file to replay (any rate and channel count)")
+    stream_parser.add_argument("--source", choices=["tone", "noise", "mono"], default="tone", help="Synthetic signal when no WAV is given (mono = one signal on every channel at different gains)")
+    stream_parser.add_argument("--channels", type=int, default=2, help="Channels of the synthetic signal")
+    stream_parser.add_argument("--seconds", type=float, default=20.0, help="Length of the synthetic signal")
+    stream_parser.add_argument("--duration", type=float, default=1.0, help="Chunk length in seconds")
+    stream_parser.add_argument("--hop", type=float, default=0.0, help="Hop length in seconds (0 = disjoint chunks)")
+    stream_parser.add_argument("--capture-rate", choices=["Auto", "Native", "Direct 16 kHz"], default="Auto")
+    stream_parser.add_argument("--precision", default="fp32")
+    stream_parser.add_argument("--backend", choices=["pytorch", "onnxruntime"], default="pytorch")
+    stream_parser.add_argument("--change-threshold", type=float, default=DEFAULT_CONFIG["change_threshold_db"], help="Change gate in dB (0 = always classify)")
+    stream_parser.add_argument("--group-threshold", type=float, default=DEFAULT_CONFIG["group_threshold"], help="Correlation above which channels share a forward pass (0 = off)")
+    stream_parser.add_argument("--realtime", action="store_true", help="Pace the replay like a live device")
+    stream_parser.set_defaults(func=bench_stream)
+
+    localize_parser = subparsers.add_parser("localize", help="Compare direction accuracy and cost of the analysis modes on panned surround scenes")
+    localize_parser.add_argument("--clips", help="Directory of WAV files to use as sources instead of synthetic clips")
+    localize_parser.add_argument("--duration", type=float, default=1.0, help="Chunk length in seconds")
+    localize_parser.add_argument("--channels", type=int, default=6)
+    localize_parser.add_argument("--map", default="Standard", help="Channel map mode")
+    localize_parser.add_argument("--runs", type=int, default=20, help="Number of scenes")
+    localize_parser.add_argument("--bed", type=float, default=0.01, help="Diffuse noise level on every channel")
+    localize_parser.add_argument("--top-k", type=int, default=3)
+    localize_parser.set_defaults(func=bench_localize)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,297 @@
-import soundcard as sc
 import numpy as np
+import sys
+import time
+import scipy.io.wavfile
 import scipy.signal
 import warnings
+import threading
+import collections
+from fractions import Fraction
+
+# soundcard needs a live audio backend; replay sources work without it
+try:
+    import soundcard as sc
+except Exception as e:
+    print(f"soundcard unavailable: {e}")
+    sc = None
 
 # Suppress soundcard data discontinuity warning
 try:
     from soundcard.mediafoundation import SoundcardRuntimeWarning
     warnings.filterwarnings("ignore", category=SoundcardRuntimeWarning)
-except ImportError:
+except Exception:
     # Fallback if specific warning class is not available or path is different
     warnings.filterwarnings("ignore", message="data discontinuity in recording")
 
+class ChunkQueue:
+    # Bounded FIFO between the capture thread and the inference consumer.
+    # When full, the oldest chunk is dropped so the consumer always gets fresh audio.
+    def __init__(self, maxsize=1):
+        self.maxsize = max(1, int(maxsize))
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            while len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def depth(self):
+        with self._cond:
+            return len(self._items)
+
+class RingBuffer:
+    # Preallocated circular buffer holding the most recent `capacity` frames.
+    # Each frame is written twice (at i and i + capacity) so the latest window
+    # is always one contiguous slice and never has to be reassembled.
+    # window(length) views stay intact for (capacity - length) more written frames.
+    def __init__(self, capacity, channels):
+        self.capacity = int(capacity)
+        self.channels = channels
+        self._data = np.zeros((2 * self.capacity, channels), dtype=np.float32)
+        self._pos = 0
+
+    def detach(self):
+        # Move writes to a fresh array; views handed out so far keep the old one
+        self._data = self._data.copy()
+
+    def write(self, frames):
+        if len(frames) > self.capacity:
+            frames = frames[-self.capacity:]
+        n = len(frames)
+        first = min(n, self.capacity - self._pos)
+        for offset in (0, self.capacity):
+            self._data[self._pos + offset:self._pos + offset + first] = frames[:first]
+            self._data[offset:offset + n - first] = frames[first:]
+        self._pos = (self._pos + n) % self.capacity
+
+    def window(self, length=None):
+        # View of the latest `length` frames (default all), oldest first
+        length = self.capacity if length is None else int(length)
+        end = self._pos + self.capacity
+        return self._data[end - length:end]
+
+class PolyphaseResampler:
+    # Stateful rational (up/down) resampler for [frames, channels] blocks.
+    # Filter history and output phase carry over between calls, so consecutive
+    # blocks are resampled as one continuous signal without boundary clicks.
+    def __init__(self, src_rate, dst_rate, channels):
+        ratio = Fraction(int(dst_rate), int(src_rate))
+        self.src_rate = int(src_rate)
+        self.dst_rate = int(dst_rate)
+        self.up = ratio.numerator
+        self.down = ratio.denominator
+        self.channels = channels
+
+        # Same anti-aliasing filter design as scipy.signal.resample_poly
+        max_rate = max(self.up, self.down)
+        self._filter = (scipy.signal.firwin(20 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * self.up).astype(np.float32)
+        self.taps = -(-len(self._filter) // self.up) # filter taps per polyphase branch
+        self._up_inv = pow(self.up, -1, self.down)
+
+        self._history = np.zeros((self.taps - 1 + self.down, channels), dtype=np.float32)
+        self._offset = 0 # upsampled-rate position of the next output, relative to the next block
+
+    def process(self, block):
+        block = np.asarray(block, dtype=np.float32)
+        n = len(block)
+        num_out = max(0, -(-(n * self.up - self._offset) // self.down))
+
+        # Prepend just enough history for the filter, plus the few extra frames
+        # that put the next output sample on upfirdn's output grid
+        lead = self.taps - 1
+        lead += ((-self._offset - lead * self.up) * self._up_inv) % self.down
+        padded = np.concatenate([self._history[len(self._history) - lead:], block])
+        start = (self._offset + lead * self.up) // self.down
+        out = scipy.signal.upfirdn(self._filter, padded, self.up, self.down, axis=0)[start:start + num_out]
+
+        keep = len(self._history)
+        if n >= keep:
+            self._history = block[n - keep:].copy()
+        else:
+            self._history = np.concatenate([self._history[n:], block])
+        self._offset += num_out * self.down - n * self.up
+        return out.astype(np.float32, copy=False)
+
+# Fallback when the backend cannot report the endpoint's mix rate
+DEFAULT_NATIVE_SR = 48000
+
+CAPTURE_RATE_MODES = ["Auto", "Native", "Direct 16 kHz"]
+
+def read_wav(path):
+    # WAV file as float32 [frames, channels] plus its sample rate
+    rate, data = scipy.io.wavfile.read(path)
+    if data.dtype == np.uint8:
+        data = (data.astype(np.float32) - 128) / 128
+    elif np.issubdtype(data.dtype, np.integer):
+        data = data.astype(np.float32) / np.iinfo(data.dtype).max
+    data = data.astype(np.float32)
+    if data.ndim == 1:
+        data = data[:, np.newaxis]
+    return data, rate
+
+class ReplaySource:
+    # Stand-in for a soundcard microphone that plays back a buffer.
+    # Exposes name/channels/samplerate and recorder() like soundcard so AudioCapturer can use it as self.mic.
+    def __init__(self, data, samplerate, name="Replay", realtime=True, loop=True):
+        data = np.asarray(data, dtype=np.float32)
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        self.data = data
+        self.samplerate = samplerate
+        self.name = name
+        self.channels = data.shape[1]
+        self.realtime = realtime # False replays as fast as the consumer reads
+        self.loop = loop # False raises EOFError at the end of the data
+
+    @classmethod
+    def from_wav(cls, path, **kwargs):
+        data, rate = read_wav(path)
+        kwargs.setdefault("name", f"Replay: {path}")
+        return cls(data, rate, **kwargs)
+
+    @classmethod
+    def tone(cls, freqs=(440.0, 880.0), duration=5.0, samplerate=DEFAULT_NATIVE_SR, amplitude=0.3, **kwargs):
+        # One sine per channel
+        t = np.arange(int(samplerate * duration)) / samplerate
+        data = np.stack([amplitude * np.sin(2 * np.pi * f * t) for f in freqs], axis=1)
+        kwargs.setdefault("name", "Replay: Tone")
+        return cls(data, samplerate, **kwargs)
+
+    @classmethod
+    def noise(cls, channels=2, duration=5.0, samplerate=DEFAULT_NATIVE_SR, amplitude=0.1, seed=0, **kwargs):
+        rng = np.random.default_rng(seed)
+        data = amplitude * rng.standard_normal((int(samplerate * duration), channels))
+        kwargs.setdefault("name", "Replay: Noise")
+        return cls(data, samplerate, **kwargs)
+
+    def recorder(self, samplerate, channels=None, blocksize=None):
+        data = self.data
+        if samplerate != self.samplerate:
+            # Resample once up front, like the audio engine would for a direct request
+            ratio = Fraction(samplerate, self.samplerate)
+            data = scipy.signal.resample_poly(data, ratio.numerator, ratio.denominator, axis=0).astype(np.float32)
+        if channels is not None:
+            data = data[:, np.arange(channels) % data.shape[1]]
+        return ReplayRecorder(data, samplerate, self.realtime, self.loop)
+
+class ReplayRecorder:
+    def __init__(self, data, samplerate, realtime, loop):
+        self.data = data
+        self.samplerate = samplerate
+        self.realtime = realtime
+        self.loop = loop
+        self.pos = 0
+        self._next_time = None
+
+    def __enter__(self):
+        self._next_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def record(self, numframes):
+        total = len(self.data)
+        if not self.loop and self.pos >= total:
+            raise EOFError("Replay source exhausted")
+
+        if self.loop:
+            idx = (self.pos + np.arange(numframes)) % total
+            block = self.data[idx]
+        else:
+            block = self.data[self.pos:self.pos + numframes]
+        self.pos += numframes
+
+        if self.realtime:
+            # Block until the frames would have been captured by a real device
+            self._next_time += numframes / self.samplerate
+            delay = self._next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return block
+
 class AudioCapturer:
     @staticmethod
     def get_devices():
+        if sc is None:
+            return []
         try:
             return [m.name for m in sc.all_microphones(include_loopback=True)]
         except Exception as e:
             print(f"Error listing devices: {e}")
             return []
 
-    def __init__(self, sample_rate=16000, chunk_duration=1.0, device_name=None):
+    def __init__(self, sample_rate=16000, chunk_duration=1.0, device_name=None, queue_size=1, hop_duration=0.0, capture_rate="Auto", source=None):
         self.target_sr = sample_rate
+        self.capture_rate = capture_rate # "Auto" (native when the mix rate is known, else direct), "Native" or "Direct 16 kHz"
+        self.capture_path = "Not started"
+        self._direct_failed = False
         self.chunk_duration = chunk_duration
+        self.hop_duration = hop_duration # 0 (or >= chunk_duration) yields disjoint chunks
+        self.ring = None
+        self.ring_hops = 0 # hops a yielded window stays valid for
+        self.produced = 0 # sliding windows yielded so far
+        self._held = None # self.produced of the window the consumer got last from get_chunk
         self.device_name = device_name
-        self.mic = None
-        self._init_mic()
+        self.mic = source # ReplaySource (or any soundcard-like microphone) skips device lookup
+        self.queue = ChunkQueue(queue_size)
+        self.running = False
+        self._thread = None
+        if self.mic is None:
+            self._init_mic()
+
+    @property
+    def queue_depth(self):
+        return self.queue.depth()
+
+    @property
+    def dropped_chunks(self):
+        return self.queue.dropped
+
+    def start(self):
+        # Record on a dedicated thread so capture continues while the model runs
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._capture_thread, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def get_chunk(self, timeout=None):
+        # Sliding windows are views into the ring buffer, valid until the next get_chunk call
+        item = self.queue.get(timeout)
+        if item is None:
+            self._held = None
+            return None
+        self._held, data = item
+        return data
+
+    def _capture_thread(self):
+        for data in self.capture_loop():
+            if not self.running:
+                break
+            self.queue.put((self.produced, data))
 
     def _init_mic(self):
         self.mic = None
+        if sc is None:
+            print("Error: No audio backend available.")
+            return
         if self.device_name:
             try:
                 mics = sc.all_microphones(include_loopback=True)
@@ -75,10 +338,49 @@ class AudioCapturer:
         else:
             print("Error: No audio device found.")
 
+    def native_samplerate(self):
+        # Shared-mode mix rate of the endpoint. Only WASAPI exposes it through soundcard.
+        if isinstance(self.mic, ReplaySource):
+            return self.mic.samplerate
+        if self.mic is None or sys.platform != 'win32':
+            return None
+        try:
+            from soundcard import mediafoundation as mf
+            client = self.mic._audio_client()
+            try:
+                mix_format = mf._ffi.new('WAVEFORMATEXTENSIBLE**')
+                mf._com.check_error(client[0][0].lpVtbl.GetMixFormat(client[0], mix_format))
+                rate = int(mix_format[0][0].Format.nSamplesPerSec)
+                mf._ole32.CoTaskMemFree(mix_format[0])
+            finally:
+                mf._com.release(client)
+            return rate
+        except Exception as e:
+            print(f"Could not query native sample rate: {e}")
+            return None
+
+    def _negotiate_samplerate(self):
+        native_sr = self.native_samplerate()
+        if native_sr == self.target_sr:
+            self.capture_path = f"Native {native_sr} Hz"
+            return native_sr
+
+        # WASAPI (auto-convert) and PulseAudio resample in the audio engine, so
+        # asking for the model rate directly skips our own resampler entirely.
+        # Auto only does so when the mix rate is unknown: WASAPI exposes it, and its
+        # auto-convert resampler is coarser than our polyphase one.
+        direct = self.capture_rate == "Direct 16 kHz" or (self.capture_rate == "Auto" and native_sr is None)
+        if direct and not self._direct_failed:
+            self.capture_path = f"Direct {self.target_sr} Hz"
+            return self.target_sr
+
+        record_sr = native_sr or DEFAULT_NATIVE_SR
+        ratio = Fraction(self.target_sr, record_sr)
+        source = "Native" if native_sr else "Assumed"
+        self.capture_path = f"{source} {record_sr} Hz -> {self.target_sr} Hz (polyphase {ratio.numerator}/{ratio.denominator})"
+        return record_sr
+
     def capture_loop(self):
-        record_sr = 44100
-        import time
-        
         while True:
             try:
                 if self.mic is None:
@@ -88,20 +390,52 @@ class AudioCapturer:
                         time.sleep(2)
                         continue
 
-                print(f"Starting recording on {self.mic.name}...")
+                record_sr = self._negotiate_samplerate()
+                print(f"Starting recording on {self.mic.name} ({self.capture_path})...")
                 with self.mic.recorder(samplerate=record_sr) as recorder:
+                    resampler = None
                     while True:
-                        num_frames = int(record_sr * self.chunk_duration)
+                        window_duration = self.chunk_duration
+                        hop_duration = self.hop_duration
+                        sliding = 0 < hop_duration < window_duration
+                        
+                        num_frames = int(record_sr * (hop_duration if sliding else window_duration))
                         data = recorder.record(numframes=num_frames)
                         
                         if record_sr != self.target_sr:
-                            new_samples = int(len(data) * self.target_sr / record_sr)
-                            data = scipy.signal.resample(data, new_samples)
+                            if resampler is None or resampler.channels != data.shape[1]:
+                                resampler = PolyphaseResampler(record_sr, self.target_sr, data.shape[1])
+                            data = resampler.process(data)
+                        
+                        if not sliding:
+                            yield data
+                            continue
                         
-                        yield data
+                        # Sliding window: append the hop and emit a view of the latest full window.
+                        # Spare frames keep the views of queued chunks and the one being processed
+                        # intact for ring_hops more hops; a consumer slower than that gets the
+                        # ring detached instead of seeing its window overwritten.
+                        window = int(self.target_sr * window_duration)
+                        self.ring_hops = self.queue.maxsize + 1
+                        capacity = window + self.ring_hops * (int(self.target_sr * hop_duration) + 2) # +2: resampled hops vary by a frame
+                        if self.ring is None or self.ring.capacity != capacity or self.ring.channels != data.shape[1]:
+                            self.ring = RingBuffer(capacity, data.shape[1])
+                        held = self._held
+                        if held is not None and self.produced - held >= self.ring_hops:
+                            self.ring.detach()
+                            self._held = None
+                        self.ring.write(data)
+                        self.produced += 1
+                        yield self.ring.window(window)
+            except EOFError as e:
+                print(f"Capture finished: {e}")
+                return
             except RuntimeError as e:
                 print(f"Audio Runtime Error: {e}")
-                if "0x88890004" in str(e) or "0x100000001" in str(e):
+                if "unsupported format" in str(e) and self.capture_path.startswith("Direct"):
+                     print("Backend rejected direct capture. Falling back to native rate...")
+                     self._direct_failed = True
+                elif "0x88890004" in str(e) or "0x100000001" in str(e):
                      print("Device invalidated. Reconnecting...")
                      time.sleep(1)
                      self._init_mic()
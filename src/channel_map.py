@@ -0,0 +1,69 @@
+import functools
+import numpy as np
+
+# Speaker layouts as channel index -> angle in degrees (0 is front, positive is right).
+# "extra" is only used when the device reports 8 or more channels.
+CHANNEL_LAYOUTS = {
+    # 0: FL, 1: FR, 2: C, 3: LFE, 4: BL, 5: BR, 6: SL, 7: SR
+    "Standard": {
+        "angles": {0: -45, 1: 45, 2: 0, 4: -135, 5: 135},
+        "extra": {6: -90, 7: 90},
+    },
+    # 0: FL, 1: FR, 2: BL, 3: BR, 4: C, 5: LFE
+    "Alternative (C/LFE Last)": {
+        "angles": {0: -45, 1: 45, 2: -135, 3: 135, 4: 0},
+        "extra": {6: -90, 7: 90},
+    },
+    # 0: FL, 1: FR, 2: C, 3: LFE, 4: SL, 5: SR
+    "Side 5.1": {
+        "angles": {0: -45, 1: 45, 2: 0, 4: -90, 5: 90},
+        "extra": {},
+    },
+    # Same order as Alternative
+    "VB-Cable (Fix Back->Front)": {
+        "angles": {0: -45, 1: 45, 2: -135, 3: 135, 4: 0},
+        "extra": {6: -90, 7: 90},
+    },
+    # Standard but swap 4/5 with 6/7
+    # 0: FL, 1: FR, 2: C, 3: LFE, 4: SL, 5: SR, 6: BL, 7: BR
+    "7.1 (Side/Back Swapped)": {
+        "angles": {0: -45, 1: 45, 2: 0, 4: -90, 5: 90},
+        "extra": {6: -135, 7: 135},
+    },
+}
+
+MAP_MODES = list(CHANNEL_LAYOUTS)
+
+# Per-Channel classifies every mapped channel; Downmix + Localize classifies one downmix
+# and places each detection from per-channel band energies
+ANALYSIS_MODES = ["Per-Channel", "Downmix + Localize"]
+
+# Mono/stereo ignore the map mode
+STEREO_ANGLES = {0: -45, 1: 45} # Left, Right
+
+class ChannelMap:
+    # Precomputed lookup tables for one (channel count, map mode) pair
+    def __init__(self, channels, map_mode="Standard"):
+        self.channels = channels
+        self.map_mode = map_mode
+
+        if channels <= 2:
+            angles = {ch: a for ch, a in STEREO_ANGLES.items() if ch < channels}
+        else:
+            layout = CHANNEL_LAYOUTS.get(map_mode, CHANNEL_LAYOUTS["Standard"])
+            angles = dict(layout["angles"])
+            if channels >= 8:
+                angles.update(layout["extra"])
+            angles = {ch: a for ch, a in angles.items() if ch < channels}
+
+        self.angles = angles # channel index -> degrees
+        self.indices = np.array(list(angles), dtype=np.intp) # channels that are classified
+        self.angle_array = np.array(list(angles.values()), dtype=np.float64)
+        rad = np.radians(self.angle_array)
+        # [mapped channels, 2] unit vectors, x is right (sin), y is front (cos)
+        self.directions = np.stack([np.sin(rad), np.cos(rad)], axis=1)
+
+@functools.lru_cache(maxsize=None)
+def get_channel_map(channels, map_mode="Standard"):
+    # Built once per layout; the engine looks it up per chunk by key
+    return ChannelMap(channels, map_mode)
@@ -1,69 +1,433 @@
 import numpy as np
-from transformers import pipeline
+from transformers import AutoConfig, AutoFeatureExtractor, AutoModelForAudioClassification
 import torch
 import time
 import os
+import contextlib
+import copy
+import threading
+import types
+import sys
+import ctypes
+from scoring import top_k_classes
+
+# Optional CPU backend; the PyTorch path works without it
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+MODEL_ID = "mit/ast-finetuned-audioset-10-10-0.4593"
+LOCAL_MODEL_PATH = os.path.join("models", "ast-finetuned-audioset-10-10-0.4593")
+
+ONNX_MODEL_PATH = os.path.join(LOCAL_MODEL_PATH, "model.onnx")
+ONNX_INT8_MODEL_PATH = os.path.join(LOCAL_MODEL_PATH, "model-int8.onnx")
+
+PRECISION_MODES = ["fp32", "bf16", "int8-dynamic"]
+POS_EMBED_MODES = ["crop", "interpolate"]
+BACKENDS = ["pytorch", "onnxruntime"]
+
+# Kaldi fbank settings used by the AST feature extractor
+FBANK_FRAME_LENGTH = 0.025 # seconds
+FBANK_FRAME_SHIFT = 0.010 # seconds
+FBANK_PREEMPHASIS = 0.97
+FBANK_LOW_FREQ = 20.0
+
+_fbank_cache = {} # (sample_rate, num_mel_bins, device) -> frame config, window, mel matrix
+
+def device_name(device):
+    return 'GPU' if device == 0 else 'CPU'
+
+def torch_device(device):
+    return torch.device("cuda:0" if device == 0 else "cpu")
+
+def get_model_source():
+    if os.path.exists(LOCAL_MODEL_PATH):
+        return LOCAL_MODEL_PATH
+    return MODEL_ID
+
+def kaldi_mel_banks(num_mel_bins, n_fft, sample_rate, low_freq=FBANK_LOW_FREQ):
+    # Triangular filters spaced on the Kaldi mel scale, shape [n_fft // 2 + 1, num_mel_bins]
+    def mel(freq):
+        return 1127.0 * np.log(1.0 + freq / 700.0)
+
+    mel_low = mel(low_freq)
+    mel_high = mel(sample_rate / 2.0)
+    mel_delta = (mel_high - mel_low) / (num_mel_bins + 1)
+
+    bin_mels = mel(np.arange(n_fft // 2) * sample_rate / n_fft)[:, np.newaxis]
+    left = mel_low + np.arange(num_mel_bins) * mel_delta
+    center = left + mel_delta
+    right = center + mel_delta
+
+    up_slope = (bin_mels - left) / (center - left)
+    down_slope = (right - bin_mels) / (right - center)
+    banks = np.maximum(0.0, np.minimum(up_slope, down_slope))
+    # Kaldi leaves the Nyquist bin out of every filter
+    return np.vstack([banks, np.zeros((1, num_mel_bins))]).astype(np.float32)
+
+def fbank_constants(sample_rate, num_mel_bins, device):
+    key = (sample_rate, num_mel_bins, str(device))
+    constants = _fbank_cache.get(key)
+    if constants is None:
+        frame_length = int(round(sample_rate * FBANK_FRAME_LENGTH))
+        frame_shift = int(round(sample_rate * FBANK_FRAME_SHIFT))
+        n_fft = 1 << (frame_length - 1).bit_length()
+        window = torch.hann_window(frame_length, periodic=False, dtype=torch.float32, device=device)
+        mel_banks = torch.from_numpy(kaldi_mel_banks(num_mel_bins, n_fft, sample_rate)).to(device)
+        constants = (frame_length, frame_shift, n_fft, window, mel_banks)
+        _fbank_cache[key] = constants
+    return constants
+
+def batched_fbank(waveforms, sample_rate, num_mel_bins):
+    # waveforms: float32 tensor [batch, samples] -> log-mel fbank [batch, frames, num_mel_bins]
+    frame_length, frame_shift, n_fft, window, mel_banks = fbank_constants(sample_rate, num_mel_bins, waveforms.device)
+
+    if waveforms.shape[-1] < frame_length:
+        return waveforms.new_zeros((waveforms.shape[0], 0, num_mel_bins))
+
+    frames = waveforms.unfold(-1, frame_length, frame_shift)
+    frames = frames - frames.mean(dim=-1, keepdim=True)
+    previous = torch.cat([frames[..., :1], frames[..., :-1]], dim=-1)
+    frames = (frames - FBANK_PREEMPHASIS * previous) * window
+
+    power = torch.fft.rfft(frames, n=n_fft).abs().pow(2)
+    return torch.log(torch.clamp(power @ mel_banks, min=torch.finfo(torch.float32).eps))
+
+def quantize_model(model):
+    # Dynamic int8 quantization of the Linear layers, in place (no float copy of the model)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def set_thread_affinity(cores):
+    # Restrict inference to the given CPU cores. On Linux the calling (worker) thread is pinned
+    # and thread pools started from it inherit the mask; Windows threads take the process mask.
+    if not cores:
+        return True
+    try:
+        if sys.platform == 'win32':
+            mask = sum(1 << core for core in cores)
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+            kernel32.SetProcessAffinityMask.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+            if not kernel32.SetProcessAffinityMask(kernel32.GetCurrentProcess(), mask):
+                raise OSError(ctypes.GetLastError(), "SetProcessAffinityMask failed")
+        elif hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores) # 0 = calling thread on Linux
+        else:
+            print("CPU affinity is not supported on this platform.")
+            return False
+        print(f"Inference pinned to cores: {sorted(cores)}")
+        return True
+    except Exception as e:
+        print(f"Error setting CPU affinity {cores}: {e}")
+        return False
+
+def apply_thread_settings(intra_op_threads=0, inter_op_threads=0, cpu_affinity=None):
+    # 0 keeps PyTorch's default (all cores). Affinity goes first so new pools respect it.
+    set_thread_affinity(cpu_affinity)
+    if intra_op_threads > 0:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads > 0:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            # Only settable once, before any inter-op work has started
+            print(f"Could not set inter-op threads: {e}")
+    print(f"Threads: intra-op {torch.get_num_threads()}, inter-op {torch.get_num_interop_threads()}")
+
+def shorten_model(model, max_frames, mode="crop"):
+    # Resize AST's time axis from config.max_length to max_frames once, so short chunks
+    # aren't padded to 10 s. "crop" keeps the first time positions (where a padded chunk
+    # sits anyway); "interpolate" resamples the whole position grid to the new length.
+    config = model.config
+    if max_frames <= 0 or max_frames >= config.max_length:
+        return model
+    if max_frames < config.patch_size:
+        print(f"max_frames {max_frames} is shorter than one patch. Using {config.patch_size}.")
+        max_frames = config.patch_size
+    embeddings = model.audio_spectrogram_transformer.embeddings
+    freq_out, time_out = embeddings.get_shape(config)
+    new_time_out = (max_frames - config.patch_size) // config.time_stride + 1
+
+    pos = embeddings.position_embeddings.data
+    hidden = pos.shape[-1]
+    # Patch tokens are laid out frequency-major after the CLS and distillation tokens
+    grid = pos[:, 2:].reshape(1, freq_out, time_out, hidden)
+    if mode == "interpolate":
+        grid = torch.nn.functional.interpolate(grid.permute(0, 3, 1, 2), size=(freq_out, new_time_out), mode="bilinear", align_corners=False)
+        grid = grid.permute(0, 2, 3, 1)
+    else:
+        grid = grid[:, :, :new_time_out]
+    new_pos = torch.cat([pos[:, :2], grid.reshape(1, freq_out * new_time_out, hidden)], dim=1)
+    embeddings.position_embeddings = torch.nn.Parameter(new_pos.contiguous())
+    config.max_length = max_frames
+    return model
+
+class OnnxModel:
+    # onnxruntime session behind the same call signature as the transformers model
+    def __init__(self, path, intra_op_threads=0):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads # 0 lets onnxruntime use the physical cores
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.max_frames = self.session.get_inputs()[0].shape[1]
+
+    def __call__(self, input_values):
+        logits = self.session.run(["logits"], {"input_values": input_values.cpu().numpy()})[0]
+        return types.SimpleNamespace(logits=torch.from_numpy(logits))
+
+def load_onnx_model(precision, intra_op_threads=0):
+    # Exported graph from download_model.py --onnx (--int8), or None to fall back to PyTorch
+    if ort is None:
+        print("onnxruntime is not installed. Using the PyTorch backend.")
+        return None
+    path = ONNX_INT8_MODEL_PATH if precision == "int8-dynamic" else ONNX_MODEL_PATH
+    if not os.path.exists(path):
+        flags = "--onnx --int8" if precision == "int8-dynamic" else "--onnx"
+        print(f"ONNX model not found at {path}. Run 'python src/download_model.py {flags} --export-only'. Using the PyTorch backend.")
+        return None
+    try:
+        print(f"Loading ONNX model from: {path}")
+        return OnnxModel(path, intra_op_threads)
+    except Exception as e:
+        print(f"Error loading ONNX model: {e}")
+        return None
+
+def correlated_groups(channels_2d, threshold):
+    # Greedy grouping of channels whose zero-lag normalized correlation is >= threshold.
+    # Returns [(leader, members)] with the loudest channel of each group as leader, plus per-channel RMS.
+    x = np.asarray(channels_2d, dtype=np.float32)
+    gram = x.T @ x
+    energy = np.diag(gram)
+    norms = np.sqrt(np.maximum(energy, 1e-20))
+    corr = gram / np.outer(norms, norms)
+
+    unassigned = np.ones(x.shape[1], dtype=bool)
+    groups = []
+    for leader in np.argsort(-energy, kind="stable"):
+        if not unassigned[leader]:
+            continue
+        members = unassigned & (corr[leader] >= threshold)
+        members[leader] = True
+        unassigned &= ~members
+        groups.append((int(leader), np.flatnonzero(members)))
+    return groups, np.sqrt(energy / max(x.shape[0], 1))
 
 class AudioClassifier:
-    def __init__(self, use_gpu=False):
-        self.device = 0 if (use_gpu and torch.cuda.is_available()) else -1
-        print(f"Initializing Classifier on device: {'GPU' if self.device == 0 else 'CPU'}")
-        
+    def __init__(self, use_gpu=False, precision="fp32", backend="pytorch", intra_op_threads=0, max_frames=0, pos_embed_mode="crop",
+                 inter_op_threads=0, cpu_affinity=None):
+        device = 0 if (use_gpu and torch.cuda.is_available()) else -1
+        self.precision = precision if precision in PRECISION_MODES else "fp32"
+        self.backend = backend if backend in BACKENDS else "pytorch"
+        if self.backend == "onnxruntime":
+            if device == 0:
+                print("onnxruntime backend is CPU only. Using CPU.")
+                device = -1
+            if self.precision == "bf16":
+                print("bf16 is not available with onnxruntime. Using fp32.")
+                self.precision = "fp32"
+        if self.precision == "int8-dynamic" and device == 0:
+            print("int8-dynamic quantization is CPU only. Using fp32 on GPU.")
+            self.precision = "fp32"
+        print(f"Initializing Classifier on device: {device_name(device)} ({self.backend}, {self.precision})")
+        apply_thread_settings(intra_op_threads, inter_op_threads, cpu_affinity)
+
         print("Loading Audio Spectrogram Transformer (AST) model...")
-        
+
         # Check for local model
-        local_model_path = os.path.join("models", "ast-finetuned-audioset-10-10-0.4593")
-        model_source = "mit/ast-finetuned-audioset-10-10-0.4593"
-        
-        if os.path.exists(local_model_path):
-            print(f"Found local model at: {local_model_path}")
-            model_source = local_model_path
+        model_source = get_model_source()
+        if model_source == LOCAL_MODEL_PATH:
+            print(f"Found local model at: {LOCAL_MODEL_PATH}")
         else:
             print(f"Local model not found. Downloading/Using cache from Hugging Face: {model_source}")
 
+        # Feature extractor and model are driven directly (no transformers pipeline)
+        self.feature_extractor = None
+        self.labels = []
+        self._input_buffer = None
+        self.channels_seen = 0 # channels passed to grouped predict_probs calls
+        self.channels_grouped = 0 # of those, served by another channel's forward pass
+
+        # (device, model) serving predictions, replaced in one assignment on a device switch.
+        # Models already moved to a device stay warm in _models so switching back is instant.
+        self._active = (device, None)
+        self._models = {}
+        self._switch_lock = threading.Lock()
+        self._switch_target = device
+        self._switch_thread = None
         try:
-            self.pipe = pipeline("audio-classification", model=model_source, device=self.device)
+            self.feature_extractor = AutoFeatureExtractor.from_pretrained(model_source)
+            model = None
+            if self.backend == "onnxruntime":
+                model = load_onnx_model(self.precision, intra_op_threads)
+                if model is None:
+                    self.backend = "pytorch"
+            if model is not None:
+                model_config = AutoConfig.from_pretrained(model_source)
+                # The exported graph has its frame count baked in
+                self.feature_extractor.max_length = model.max_frames
+            else:
+                model = AutoModelForAudioClassification.from_pretrained(model_source)
+                model.eval()
+                if self.precision == "int8-dynamic":
+                    print("Quantizing model (int8-dynamic)...")
+                    model = quantize_model(model)
+                shorten_model(model, max_frames, pos_embed_mode)
+                model.to(torch_device(device))
+                model_config = model.config
+                self.feature_extractor.max_length = model_config.max_length
+            print(f"Model input: {self.feature_extractor.max_length} frames")
+            self.labels = [model_config.id2label[i] for i in range(model_config.num_labels)]
+            self._models[device] = model
+            self._active = (device, model)
             print("Model loaded.")
         except Exception as e:
             print(f"Error loading model: {e}")
-            self.pipe = None
+
+    @property
+    def device(self):
+        return self._active[0]
+
+    @property
+    def model(self):
+        return self._active[1]
+
+    @property
+    def torch_device(self):
+        return torch_device(self.device)
 
     def set_device(self, use_gpu):
+        # Non-blocking: the current model keeps serving until the new one is ready
         new_device = 0 if (use_gpu and torch.cuda.is_available()) else -1
-        if new_device != self.device:
-            print(f"Switching device to {'GPU' if new_device == 0 else 'CPU'}...")
-            self.device = new_device
-            
-            # Re-determine model source
-            local_model_path = os.path.join("models", "ast-finetuned-audioset-10-10-0.4593")
-            model_source = local_model_path if os.path.exists(local_model_path) else "mit/ast-finetuned-audioset-10-10-0.4593"
-
-            # Reload pipeline to switch device reliably
-            try:
-                self.pipe = pipeline("audio-classification", model=model_source, device=self.device)
-            except Exception as e:
-                print(f"Error switching device: {e}")
+        if new_device == 0 and self.precision == "int8-dynamic":
+            print("int8-dynamic model cannot run on GPU. Staying on CPU.")
+            return
+        if new_device == 0 and self.backend == "onnxruntime":
+            print("onnxruntime backend is CPU only. Staying on CPU.")
+            return
+        with self._switch_lock:
+            self._switch_target = new_device
+            if new_device == self.device or self.model is None:
+                return
+            if self._switch_thread is None:
+                print(f"Switching device to {device_name(new_device)}...")
+                self._switch_thread = threading.Thread(target=self._switch_device, daemon=True)
+                self._switch_thread.start()
+
+    def _switch_device(self):
+        while True:
+            with self._switch_lock:
+                target = self._switch_target
+                if target == self.device:
+                    self._switch_thread = None
+                    return
+
+            model = self._models.get(target)
+            if model is None:
+                try:
+                    # Copy the loaded weights across instead of reloading from disk
+                    model = copy.deepcopy(self._models[self.device]).to(torch_device(target))
+                except Exception as e:
+                    print(f"Error switching device: {e}")
+                    with self._switch_lock:
+                        self._switch_thread = None
+                    return
+                self._models[target] = model
+
+            self._active = (target, model)
+            print(f"Switched device to {device_name(target)}.")
+
+    def extract_features(self, channels_2d, device=None):
+        # All channels share length and rate, so one batched fbank replaces N extractor calls
+        fe = self.feature_extractor
+        target = torch_device(self.device if device is None else device)
+        waveforms = torch.from_numpy(np.ascontiguousarray(channels_2d.T, dtype=np.float32)).to(target)
+        fbank = batched_fbank(waveforms, fe.sampling_rate, fe.num_mel_bins)
+
+        # Reuse one preallocated input tensor while the batch shape and device are unchanged
+        shape = (waveforms.shape[0], fe.max_length, fe.num_mel_bins)
+        if self._input_buffer is None or tuple(self._input_buffer.shape) != shape or self._input_buffer.device != waveforms.device:
+            self._input_buffer = torch.empty(shape, dtype=torch.float32, device=target)
+
+        # Pad/truncate to max_length and normalize like ASTFeatureExtractor
+        num_frames = min(fbank.shape[1], fe.max_length)
+        inputs = self._input_buffer
+        inputs.zero_()
+        inputs[:, :num_frames] = fbank[:, :num_frames]
+        if fe.do_normalize:
+            inputs.sub_(fe.mean).div_(fe.std * 2)
+        return inputs
+
+    def _autocast(self, device):
+        if self.precision == "bf16":
+            return torch.autocast(device_type=torch_device(device).type, dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
+    def warmup(self, num_samples, channels=2):
+        # One pass on silence so the first live chunk doesn't pay allocator/kernel warm-up
+        if self.feature_extractor is not None:
+            num_frames = (num_samples - int(self.feature_extractor.sampling_rate * FBANK_FRAME_LENGTH)) // int(self.feature_extractor.sampling_rate * FBANK_FRAME_SHIFT) + 1
+            if num_frames > self.feature_extractor.max_length:
+                print(f"Warning: chunks of {num_frames} frames exceed the model input of {self.feature_extractor.max_length} frames and will be truncated")
+        start_time = time.time()
+        self.predict_batch(np.zeros((num_samples, channels), dtype=np.float32), top_k=1)
+        return time.time() - start_time
 
     def predict(self, waveform, top_k=5):
-        if self.pipe is None:
-            return [], 0.0
+        results, latency = self.predict_batch(np.asarray(waveform).reshape(-1, 1), top_k=top_k)
+        return results[0], latency
 
-        # Ensure waveform is float32
-        if waveform.dtype != np.float32:
-            waveform = waveform.astype(np.float32)
+    @property
+    def group_ratio(self):
+        # Share of channels that reused a correlated channel's forward pass
+        return self.channels_grouped / self.channels_seen if self.channels_seen else 0.0
+
+    def predict_batch(self, channels_2d, top_k=5, group_threshold=0.0):
+        # channels_2d: [frames, channels] -> one top-k list per channel
+        probs, latency = self.predict_probs(channels_2d, group_threshold)
+        ids, scores = top_k_classes(probs, top_k)
+        results = []
+        for ch_ids, ch_scores in zip(ids.tolist(), scores.tolist()):
+            results.append([(self.labels[i], score) for i, score in zip(ch_ids, ch_scores)])
+        return results, latency
+
+    def predict_probs(self, channels_2d, group_threshold=0.0):
+        # channels_2d: [frames, channels] -> [channels, classes] softmax probabilities.
+        # With group_threshold > 0, near-identical channels share one forward pass of the loudest member
+        # and get its probabilities scaled by their gain relative to it.
+        num_channels = channels_2d.shape[1]
+        if group_threshold > 0 and num_channels > 1:
+            groups, rms = correlated_groups(channels_2d, group_threshold)
+            self.channels_seen += num_channels
+            self.channels_grouped += num_channels - len(groups)
+            if len(groups) < num_channels:
+                leaders = [leader for leader, _ in groups]
+                leader_probs, latency = self.predict_probs(channels_2d[:, leaders])
+                probs = np.empty((num_channels, leader_probs.shape[1]), dtype=np.float32)
+                for (leader, members), leader_row in zip(groups, leader_probs):
+                    gain = rms[members] / rms[leader] if rms[leader] > 0 else np.ones(len(members))
+                    probs[members] = leader_row * gain[:, None]
+                return probs, latency
+
+        device, model = self._active
+        if model is None or num_channels == 0:
+            return np.zeros((num_channels, len(self.labels)), dtype=np.float32), 0.0
 
         start_time = time.time()
         try:
-            predictions = self.pipe(waveform, top_k=top_k)
+            # Single feature pass and single forward pass over all channels
+            with torch.inference_mode():
+                inputs = self.extract_features(channels_2d, device)
+                with self._autocast(device):
+                    logits = model(input_values=inputs).logits
+                probs = torch.softmax(logits.float(), dim=-1).cpu().numpy()
         except Exception as e:
             print(f"Prediction error: {e}")
-            return [], 0.0
+            return np.zeros((num_channels, len(self.labels)), dtype=np.float32), 0.0
         end_time = time.time()
         latency = end_time - start_time
-        
-        results = []
-        for p in predictions:
-            results.append((p['label'], p['score']))
-            
-        return results, latency
 
+        return probs, latency
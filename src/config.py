@@ -5,19 +5,36 @@ CONFIG_FILE = 'config.json'
 
 DEFAULT_CONFIG = {
     "use_gpu": False,
+    "precision": "fp32",
+    "backend": "pytorch",
+    "intra_op_threads": 0,
+    "inter_op_threads": 0,
+    "cpu_affinity": [],
+    "max_frames": 0,
+    "pos_embed_mode": "crop",
     "chunk_duration": 1.0,
+    "hop_duration": 0.0,
     "top_k": 3,
     "confidence_threshold": 0.2,
+    "change_threshold_db": 4.0,
+    "max_reuse_chunks": 2,
+    "group_threshold": 0.98,
+    "smoothing_attack_time": 0.0,
+    "smoothing_release_time": 3.5,
     "enable_radar": False,
     "normalize_audio": False,
     "normalization_threshold": 0.01,
     "apply_hamming": False,
     "show_debug": False,
     "audio_device": None,
+    "capture_rate": "Auto",
     "radar_position": "Bottom Center",
     "radar_size": 300,
+    "overlay_fps": 30,
     "channel_map": "Standard",
-    "show_channel_levels": False
+    "analysis_mode": "Per-Channel",
+    "show_channel_levels": False,
+    "max_queued_chunks": 1
 }
 
 def load_config():
@@ -1,9 +1,15 @@
 import os
+import argparse
 from transformers import AutoFeatureExtractor, AutoModelForAudioClassification
 
+MODEL_ID = "mit/ast-finetuned-audioset-10-10-0.4593"
+LOCAL_DIR = os.path.join("models", "ast-finetuned-audioset-10-10-0.4593")
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model-int8.onnx"
+
 def download_model():
-    model_id = "mit/ast-finetuned-audioset-10-10-0.4593"
-    local_dir = os.path.join("models", "ast-finetuned-audioset-10-10-0.4593")
+    model_id = MODEL_ID
+    local_dir = LOCAL_DIR
     
     print(f"Downloading model '{model_id}' to '{local_dir}'...")
     
@@ -23,9 +29,61 @@ def download_model():
         
         print("Download complete.")
         print(f"Model saved to: {os.path.abspath(local_dir)}")
+        return True
     except Exception as e:
         print(f"Error downloading model: {e}")
         print("Please ensure you have a stable internet connection (VPN might be required).")
+        return False
+
+def export_onnx(local_dir=LOCAL_DIR, quantize=False, max_frames=0, pos_embed_mode="crop"):
+    # Export the saved model to ONNX next to it (works offline from the local copy).
+    # max_frames > 0 bakes a shortened input length into the graph.
+    import torch
+    from classifier import shorten_model
+
+    onnx_path = os.path.join(local_dir, ONNX_FILE)
+    try:
+        print(f"Exporting ONNX graph to '{onnx_path}'...")
+        model = AutoModelForAudioClassification.from_pretrained(local_dir)
+        model.eval()
+        shorten_model(model, max_frames, pos_embed_mode)
+        dummy = torch.zeros(1, model.config.max_length, model.config.num_mel_bins)
+        with torch.no_grad():
+            torch.onnx.export(
+                model, (dummy,), onnx_path,
+                input_names=["input_values"], output_names=["logits"],
+                # Batch axis is dynamic so all channels run in one session call
+                dynamic_axes={"input_values": {0: "batch"}, "logits": {0: "batch"}},
+                opset_version=17, dynamo=False
+            )
+        print("ONNX export complete.")
+    except Exception as e:
+        print(f"Error exporting ONNX model: {e}")
+        return False
+
+    if quantize:
+        int8_path = os.path.join(local_dir, ONNX_INT8_FILE)
+        try:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            print(f"Quantizing ONNX graph to '{int8_path}' (int8 dynamic)...")
+            quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+            print("ONNX quantization complete.")
+        except Exception as e:
+            print(f"Error quantizing ONNX model: {e}")
+            return False
+    return True
 
 if __name__ == "__main__":
-    download_model()
+    parser = argparse.ArgumentParser(description="Download the AST model and optionally export it to ONNX")
+    parser.add_argument("--onnx", action="store_true", help="Also export an ONNX graph for the onnxruntime backend")
+    parser.add_argument("--int8", action="store_true", help="Also write an int8-quantized ONNX graph (implies --onnx)")
+    parser.add_argument("--export-only", action="store_true", help="Skip the download and export from the existing local model")
+    parser.add_argument("--max-frames", type=int, default=0, help="Shorten the ONNX graph input to this many frames (0 = full 1024)")
+    parser.add_argument("--pos-embed", choices=["crop", "interpolate"], default="crop", help="How position embeddings are shortened")
+    args = parser.parse_args()
+
+    ok = True
+    if not args.export_only:
+        ok = download_model()
+    if ok and (args.onnx or args.int8):
+        export_onnx(quantize=args.int8, max_frames=args.max_frames, pos_embed_mode=args.pos_embed)
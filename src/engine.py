@@ -0,0 +1,512 @@
+import time
+import math
+import functools
+import threading
+import numpy as np
+from channel_map import get_channel_map
+from scoring import top_k_classes
+
+# Headless processing core: chunk + config in, structured detections out.
+# No Qt or audio device imports, so it can run as a service or in a benchmark.
+
+class StageTimer:
+    # Wall-clock and process CPU time of consecutive processing stages
+    def __init__(self):
+        self.times = {} # stage -> (wall_seconds, cpu_seconds)
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def lap(self, stage):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        self.times[stage] = (wall - self._wall, cpu - self._cpu)
+        self._wall = wall
+        self._cpu = cpu
+
+@functools.lru_cache(maxsize=8)
+def hamming_window(length):
+    # Column vector so it broadcasts over channels
+    return np.hamming(length).astype(np.float32)[:, np.newaxis]
+
+def meter(audio_chunk):
+    # Per-channel RMS and peak of [frames, channels] without full-size temporaries
+    frames, channels = audio_chunk.shape
+    sum_sq = np.einsum('ij,ij->j', audio_chunk, audio_chunk)
+    rms = np.sqrt(sum_sq / max(frames, 1)).astype(np.float64)
+    # max/min along axis 0 of a narrow array is slow; fold rows so each reduction row is wide
+    fold = math.gcd(frames, 16) or 1
+    folded = audio_chunk.reshape(frames // fold, fold * channels)
+    high = folded.max(axis=0).reshape(fold, channels).max(axis=0)
+    low = folded.min(axis=0).reshape(fold, channels).min(axis=0)
+    peak = np.maximum(high, -low).astype(np.float64)
+    return rms, peak
+
+FINGERPRINT_BANDS = 24
+FINGERPRINT_SEGMENT = 512 # samples per FFT segment; averaging segments keeps noise fingerprints stable
+FINGERPRINT_FLOOR_DB = 60.0 # bands further below the loudest band are clamped
+LEVEL_RMS_RATIO = 0.25 # RMS gate as a fraction of the change threshold
+
+@functools.lru_cache(maxsize=1)
+def fingerprint_tables():
+    # Hann window and log-spaced rfft bin edges (low frequencies weigh as much as high ones)
+    window = np.hanning(FINGERPRINT_SEGMENT).astype(np.float32)
+    num_bins = FINGERPRINT_SEGMENT // 2 + 1
+    edges = np.unique(np.geomspace(1, num_bins, FINGERPRINT_BANDS + 1).astype(np.intp))
+    return window, edges[:-1]
+
+def band_power(audio_chunk):
+    # [channels, bands] segment-averaged band energies of a [frames, channels] chunk
+    window, edges = fingerprint_tables()
+    frames, channels = audio_chunk.shape
+    segments = max(frames // FINGERPRINT_SEGMENT, 1)
+    if frames < FINGERPRINT_SEGMENT:
+        audio_chunk = np.pad(audio_chunk, ((0, FINGERPRINT_SEGMENT - frames), (0, 0)))
+    blocks = audio_chunk[:segments * FINGERPRINT_SEGMENT].reshape(segments, FINGERPRINT_SEGMENT, channels)
+    spectrum = np.abs(np.fft.rfft(blocks * window[:, np.newaxis], axis=1)) ** 2
+    power = spectrum.mean(axis=0) # [bins, channels]
+    return np.add.reduceat(power, edges, axis=0).T
+
+def spectral_fingerprint(audio_chunk):
+    # [channels, bands] band energies in dB, clamped FINGERPRINT_FLOOR_DB below the loudest band
+    db = 10 * np.log10(band_power(audio_chunk) + 1e-12)
+    return np.maximum(db, db.max(axis=1, keepdims=True) - FINGERPRINT_FLOOR_DB)
+
+def vector_angles(vectors):
+    # [n, 2] (x right, y front) -> degrees from front in [-180, 180] and magnitudes.
+    # atan2 measures from the x-axis (Right); our angle is measured from Up/Front,
+    # so angle = 90 - atan2(y, x)
+    angles = 90 - np.degrees(np.arctan2(vectors[:, 1], vectors[:, 0]))
+    angles = np.where(angles > 180, angles - 360, angles)
+    return angles, np.hypot(vectors[:, 0], vectors[:, 1])
+
+class ChangeDetector:
+    # Remembers each channel's fingerprint, levels and results from its last inference.
+    # A channel reuses those results only while no band moved threshold_db or more
+    # and its RMS and peak stayed put (a short click barely moves the spectrum but jumps the peak).
+    def __init__(self):
+        self.reset()
+
+    def reset(self, key=None):
+        self.key = key # cached results are only valid for the same chunk length
+        self.fingerprints = {} # channel -> fingerprint at last inference
+        self.levels = {} # channel -> (rms dB, peak dB) at last inference
+        self.results = {} # channel -> class probabilities at last inference
+        self.ages = {} # channel -> chunks since last inference
+
+    def changed(self, channels, fingerprints, levels, key, threshold_db, max_reuse):
+        # Boolean mask over channels that need a fresh inference
+        if key != self.key:
+            self.reset(key)
+        mask = np.ones(len(channels), dtype=bool)
+        for i, ch in enumerate(channels):
+            if ch not in self.fingerprints or self.ages[ch] >= max_reuse:
+                continue
+            # Largest change of any band, so a change confined to a few bands is not averaged away
+            if np.max(np.abs(fingerprints[i] - self.fingerprints[ch])) >= threshold_db:
+                continue
+            # Stationary sound keeps its RMS within a fraction of a dB; the peak wanders more
+            rms_change, peak_change = np.abs(levels[i] - self.levels[ch])
+            if rms_change >= threshold_db * LEVEL_RMS_RATIO or peak_change >= threshold_db:
+                continue
+            mask[i] = False
+            self.ages[ch] += 1
+        return mask
+
+    def store(self, ch, fingerprint, level, results):
+        self.fingerprints[ch] = fingerprint
+        self.levels[ch] = level
+        self.results[ch] = results
+        self.ages[ch] = 0
+
+def update_interval(cfg):
+    # Seconds between processed chunks: the hop for sliding windows, else the chunk length
+    chunk = cfg.get("chunk_duration", 1.0)
+    hop = cfg.get("hop_duration", 0.0)
+    return hop if 0 < hop < chunk else chunk
+
+def ema_rate(interval, time_constant):
+    # Per-update EMA rate for a time constant in seconds (0 = no smoothing)
+    if time_constant <= 0:
+        return 1.0
+    return 1.0 - math.exp(-interval / time_constant)
+
+DOWNMIX_KEY = -1 # change-detector slot for the downmix input
+TEMPLATE_ALPHA = 0.2 # EMA rate of the per-class band-energy templates
+
+class Detections:
+    # Result of one processed chunk
+    def __init__(self, channels):
+        self.channels = channels
+        self.radar_mode = 'semi' # 'semi' (stereo, position -1..1) or 'full' (surround, degrees)
+        self.left = [] # [(name, score)] shown on the left side
+        self.right = [] # [(name, score)] shown on the right side
+        self.radar_dots = [] # [(position or angle, dist, name, score)] from smoothed probabilities
+        self.channel_levels = [] # [(angle, rms)]
+        self.rms = None # per-channel RMS after windowing/normalization
+        self.peak = None # per-channel peak after windowing/normalization
+        self.silent = None # per-channel mask of channels skipped by inference
+        self.reused = None # per-channel mask of channels that reused cached results
+        self.latency = 0.0 # model time in seconds (0 when every input was silent or reused)
+        self.inferred = False # the model ran for this chunk
+        self.stage_times = {} # stage -> (wall, cpu) seconds
+
+def format_labels(detections):
+    # Overlay text for both sides
+    left = [f"{name} ({score:.2f})" for name, score in detections.left]
+    right = [f"{name} ({score:.2f})" for name, score in detections.right]
+    if detections.radar_mode == 'semi':
+        left_text = "< " + "\n< ".join(left) if left else ""
+        right_text = "\n".join(right) + " >" if right else ""
+    else:
+        left_text = "\n".join(left)
+        right_text = "\n".join(right)
+    return left_text, right_text
+
+class DisplaySnapshot:
+    # Compact overlay payload for one chunk. Fields hold strings and tuples only,
+    # so the overlay can diff it against the snapshot it last applied.
+    __slots__ = ("left_text", "right_text", "radar_dots", "debug_info", "radar_mode", "channel_levels")
+
+    def __init__(self, left_text="", right_text="", radar_dots=(), debug_info="", radar_mode='semi', channel_levels=()):
+        self.left_text = left_text
+        self.right_text = right_text
+        self.radar_dots = radar_dots # ((position or angle, dist, name, score), ...)
+        self.debug_info = debug_info
+        self.radar_mode = radar_mode
+        self.channel_levels = channel_levels # ((angle, rms), ...)
+
+    @classmethod
+    def from_detections(cls, detections, debug_info=""):
+        left_text, right_text = format_labels(detections)
+        return cls(left_text, right_text, tuple(detections.radar_dots), debug_info,
+                   detections.radar_mode, tuple(detections.channel_levels))
+
+    def is_empty(self):
+        return not (self.left_text or self.right_text or self.radar_dots or self.debug_info or self.channel_levels)
+
+class SnapshotMailbox:
+    # Single-slot, latest-value-wins handoff from the worker thread to the GUI.
+    # A newer snapshot replaces one the GUI has not taken yet instead of queueing behind it.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self.posted = 0
+        self.overwritten = 0 # snapshots replaced before the GUI took them
+
+    def post(self, snapshot):
+        # Returns True if the mailbox was empty, i.e. the GUI needs a wake-up
+        with self._lock:
+            was_empty = self._snapshot is None
+            self._snapshot = snapshot
+            self.posted += 1
+            if not was_empty:
+                self.overwritten += 1
+        return was_empty
+
+    def pending(self):
+        with self._lock:
+            return self._snapshot is not None
+
+    def take(self):
+        with self._lock:
+            snapshot, self._snapshot = self._snapshot, None
+        return snapshot
+
+class ProcessingEngine:
+    def __init__(self, classifier):
+        self.classifier = classifier
+        self.class_probs = None # [rows, classes] smoothed probabilities, one row per mapped channel (or the downmix)
+        self.class_probs_key = None # (analysis, channel count, map mode) the rows belong to
+        labels = classifier.labels
+        self.silence_id = labels.index('Silence') if 'Silence' in labels else -1
+        self._work = None # reused buffer for the windowed/normalized chunk
+        self.change_detector = ChangeDetector()
+        self.class_templates = {} # name -> normalized band-energy profile seen with that class
+        self.mapped_count = 0 # mapped channels seen since start
+        self.skipped_count = 0 # of those, silent or unchanged (no inference)
+        self.downmixed_count = 0 # of those, folded into another channel's downmix inference
+        self.inferred_count = 0 # model inputs actually run
+        self.last_latency = 0.0 # model time of the last chunk that ran inference
+
+    @property
+    def skip_ratio(self):
+        return self.skipped_count / self.mapped_count if self.mapped_count else 0.0
+
+    @property
+    def downmix_ratio(self):
+        # Structural saving of Downmix + Localize, separate from silence/reuse skips
+        return self.downmixed_count / self.mapped_count if self.mapped_count else 0.0
+
+    def process(self, audio_chunk, cfg):
+        # audio_chunk: [frames, channels]. Returns Detections, or None for a silent chunk.
+        timer = StageTimer()
+
+        result = self.preprocess(audio_chunk, cfg)
+        if result is None:
+            self.release(cfg) # Silence still lets old detections fade
+            return None
+        audio_chunk, rms, peak = result
+        timer.lap("preprocess")
+
+        channels = audio_chunk.shape[1]
+        detections = Detections(channels)
+        detections.rms = rms
+        detections.peak = peak
+        detections.silent = rms < cfg["normalization_threshold"]
+        channel_map = get_channel_map(channels, cfg.get("channel_map", "Standard"))
+        timer.lap("channel_map")
+
+        if cfg.get("show_channel_levels", False):
+            detections.channel_levels = [(channel_map.angles[ch], float(rms[ch])) for ch in sorted(channel_map.angles)]
+        timer.lap("levels")
+
+        # Audible mapped channels; silent ones get no results
+        audible = ~detections.silent[channel_map.indices]
+        candidates = channel_map.indices[audible]
+        detections.reused = np.zeros(channels, dtype=bool)
+
+        downmix = cfg.get("analysis_mode", "Per-Channel") == "Downmix + Localize" and channels > 1
+        if downmix:
+            # One model input regardless of channel count
+            if len(candidates):
+                keys = [DOWNMIX_KEY]
+                inputs = audio_chunk[:, candidates].mean(axis=1, keepdims=True)
+            else:
+                keys = []
+                inputs = audio_chunk[:, :0] # (frames, 0); nothing mapped is audible
+        else:
+            keys = list(candidates)
+            inputs = audio_chunk[:, candidates]
+        probs, reused = self.classify(inputs, keys, cfg, detections)
+
+        inferred = int((~reused).sum())
+        self.mapped_count += len(channel_map.indices)
+        self.inferred_count += inferred
+        if downmix:
+            # Audible channels share the downmix input; only a reused downmix counts as skipped
+            self.skipped_count += len(channel_map.indices) - (len(candidates) if inferred else 0)
+            self.downmixed_count += len(candidates) - inferred if inferred else 0
+        else:
+            self.skipped_count += len(channel_map.indices) - inferred
+        timer.lap("classify")
+
+        # Full probability vectors per row; silent channels contribute zeros and fade out at the release rate
+        frame_probs = np.zeros((1 if downmix else len(channel_map.indices), len(self.classifier.labels)), dtype=np.float32)
+        if downmix:
+            frame_probs[:len(probs)] = probs
+        else:
+            frame_probs[np.flatnonzero(audible)] = probs
+        smoothed = self.smooth(frame_probs, ("downmix" if downmix else "per-channel", channels, channel_map.map_mode), cfg)
+        batch_results = self.top_classes(smoothed, cfg)
+        timer.lap("smoothing")
+
+        if downmix:
+            detections.reused[candidates] = reused.any()
+            self.localize(detections, channel_map, audio_chunk, np.flatnonzero(audible), batch_results[0], cfg)
+        else:
+            detections.reused[candidates] = reused
+
+            # Stereo (2 Channels) or Mono (1 Channel) vs Surround Sound (> 2 Channels)
+            if channels <= 2:
+                self.fuse_stereo(detections, batch_results, cfg)
+            else:
+                self.fuse_surround(detections, channel_map, batch_results, cfg)
+        timer.lap("fusion")
+
+        detections.stage_times = timer.times
+        return detections
+
+    def classify(self, inputs, keys, cfg, detections):
+        # [inputs, classes] probabilities (one batched model call) and a mask of inputs that reused cached ones.
+        # Inputs whose spectrum barely moved since their last inference reuse those probabilities.
+        probs = np.zeros((len(keys), len(self.classifier.labels)), dtype=np.float32)
+        needs_inference = np.ones(len(keys), dtype=bool)
+        threshold_db = cfg.get("change_threshold_db", 0.0)
+        if threshold_db > 0 and keys:
+            fingerprints = spectral_fingerprint(inputs)
+            levels = 20 * np.log10(np.stack(meter(inputs), axis=1) + 1e-12) # [inputs, (rms, peak)] in dB
+            needs_inference = self.change_detector.changed(keys, fingerprints, levels, len(inputs), threshold_db, cfg.get("max_reuse_chunks", 2))
+            for i in np.flatnonzero(~needs_inference):
+                probs[i] = self.change_detector.results[keys[i]]
+
+        infer = np.flatnonzero(needs_inference)
+        if len(infer):
+            probs[infer], detections.latency = self.classifier.predict_probs(inputs[:, infer], group_threshold=cfg.get("group_threshold", 0.0))
+            detections.inferred = True
+            self.last_latency = detections.latency
+            if threshold_db > 0:
+                for i in infer:
+                    self.change_detector.store(keys[i], fingerprints[i], levels[i], probs[i].copy())
+        return probs, ~needs_inference
+
+    def smooth(self, probs, key, cfg):
+        # Per-class, per-row EMA of the probabilities: attack rate while a class rises, release rate while it falls
+        if self.class_probs is None or self.class_probs_key != key or self.class_probs.shape != probs.shape:
+            self.class_probs = probs.copy()
+            self.class_probs_key = key
+            return self.class_probs
+        # Time constants in seconds, so the smoothing time doesn't change with the hop or chunk length
+        rate = np.where(probs > self.class_probs,
+                        ema_rate(update_interval(cfg), cfg.get("smoothing_attack_time", 0.0)),
+                        ema_rate(update_interval(cfg), cfg.get("smoothing_release_time", 3.5)))
+        self.class_probs += rate * (probs - self.class_probs)
+        return self.class_probs
+
+    def release(self, cfg):
+        # One silent interval: every smoothed probability decays towards zero at the release rate
+        if self.class_probs is not None:
+            self.class_probs *= 1.0 - ema_rate(update_interval(cfg), cfg.get("smoothing_release_time", 3.5))
+
+    def top_classes(self, probs, cfg):
+        # Top-k and threshold over all rows at once -> one [(name, score)] list per row
+        ids, scores = top_k_classes(probs, cfg["top_k"])
+        keep = (scores > cfg["confidence_threshold"]) & (ids != self.silence_id)
+        labels = self.classifier.labels
+        return [[(labels[i], score) for i, score, k in zip(row_ids, row_scores, row_keep) if k]
+                for row_ids, row_scores, row_keep in zip(ids.tolist(), scores.tolist(), keep.tolist())]
+
+    def preprocess(self, audio_chunk, cfg):
+        # Returns (chunk, per-channel rms, per-channel peak), or None when the chunk is silent.
+        # Windowing and normalization write into a reused buffer instead of allocating per chunk.
+        if self._work is None or self._work.shape != audio_chunk.shape:
+            self._work = np.empty(audio_chunk.shape, dtype=np.float32)
+
+        # Apply Hamming Window (cached per length, broadcast to all channels)
+        if cfg["apply_hamming"]:
+            audio_chunk = np.multiply(audio_chunk, hamming_window(len(audio_chunk)), out=self._work)
+
+        # One metering pass; normalization only rescales the results
+        rms, peak = meter(audio_chunk)
+
+        # Normalization
+        if cfg["normalize_audio"]:
+            max_val = peak.max()
+            if max_val > cfg["normalization_threshold"]:
+                audio_chunk = np.multiply(audio_chunk, 1.0 / max_val, out=self._work)
+                rms /= max_val
+                peak /= max_val
+            # Else: too quiet, don't boost noise
+
+        # Check for silence (using normalization threshold as silence threshold too)
+        if np.sqrt(np.mean(rms**2)) < cfg["normalization_threshold"]:
+            return None
+        return audio_chunk, rms, peak
+
+    def fuse_stereo(self, detections, batch_results, cfg):
+        # batch_results are already thresholded top-k lists
+        detections.radar_mode = 'semi'
+
+        left_results = batch_results[0] if len(batch_results) >= 1 else []
+        right_results = batch_results[1] if len(batch_results) >= 2 else []
+        detections.left = list(left_results)
+        detections.right = list(right_results)
+
+        # Radar Logic for Stereo
+        if not cfg["enable_radar"]:
+            return
+
+        all_preds = {} # name -> {'left': score, 'right': score}
+        for name, score in left_results:
+            if name not in all_preds: all_preds[name] = {'left': 0, 'right': 0}
+            all_preds[name]['left'] = score
+
+        for name, score in right_results:
+            if name not in all_preds: all_preds[name] = {'left': 0, 'right': 0}
+            all_preds[name]['right'] = score
+
+        for name, scores in all_preds.items():
+            l = scores['left']
+            r = scores['right']
+
+            # Position: -1 (Left) to 1 (Right)
+            if l + r > 0:
+                pos = (r - l) / (l + r)
+            else:
+                pos = 0
+
+            dist = max(l, r)
+            detections.radar_dots.append((pos, dist, name, dist))
+
+    def fuse_surround(self, detections, channel_map, batch_results, cfg):
+        detections.radar_mode = 'full'
+
+        # Score matrix [classes, mapped channels], classes in order of first appearance
+        class_index = {} # name -> row
+        entries = []
+        for ch, results in enumerate(batch_results):
+            for name, score in results:
+                entries.append((class_index.setdefault(name, len(class_index)), ch, score))
+        if not entries:
+            return
+
+        names = list(class_index)
+        scores = np.zeros((len(names), len(batch_results)))
+        rows, cols, values = zip(*entries)
+        scores[rows, cols] = values
+
+        # Sum of score-weighted unit vectors per class (x right, y front)
+        vectors = scores @ channel_map.directions
+        max_scores = scores.max(axis=1)
+        angles, magnitudes = vector_angles(vectors)
+
+        for name, angle_deg, dist, mag in zip(names, angles.tolist(), max_scores.tolist(), magnitudes.tolist()):
+            if mag <= 0:
+                continue
+            # Distance: use max_score as distance proxy
+            detections.radar_dots.append((angle_deg, dist, name, dist))
+
+            # Also populate text for Left/Right based on angle
+            if angle_deg < 0:
+                detections.left.append((name, dist))
+            if angle_deg > 0:
+                detections.right.append((name, dist))
+
+    def localize(self, detections, channel_map, audio_chunk, rows, detected, cfg):
+        # Place each downmix detection by the per-channel energy in the bands that class occupies.
+        # rows: positions in channel_map.indices of the audible channels that went into the downmix.
+        stereo = detections.channels <= 2
+        detections.radar_mode = 'semi' if stereo else 'full'
+        if not detected or not len(rows):
+            return
+
+        power = band_power(audio_chunk[:, channel_map.indices[rows]]) # [channels, bands]
+        mix = power.sum(axis=0)
+        mix_profile = mix / max(mix.sum(), 1e-12)
+
+        # Band-energy template per class, tracked while it is detected
+        templates = []
+        for name, _ in detected:
+            template = self.class_templates.get(name)
+            template = mix_profile if template is None else (1 - TEMPLATE_ALPHA) * template + TEMPLATE_ALPHA * mix_profile
+            self.class_templates[name] = template
+            templates.append(template)
+
+        # [classes, channels] share of each class's energy per channel
+        weights = np.array(templates) @ power.T
+        weights /= np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+
+        if stereo:
+            # Downmix only runs for two or more channels, so stereo here is exactly Left/Right
+            left_right = np.zeros((len(detected), 2))
+            left_right[:, rows] = weights
+            for (name, score), (l, r) in zip(detected, left_right.tolist()):
+                # Position: -1 (Left) to 1 (Right)
+                pos = (r - l) / (l + r) if l + r > 0 else 0
+                if pos < 0.5:
+                    detections.left.append((name, score))
+                if pos > -0.5:
+                    detections.right.append((name, score))
+                if cfg["enable_radar"]:
+                    detections.radar_dots.append((pos, score, name, score))
+            return
+
+        # Energy vector per class (x right, y front)
+        angles, magnitudes = vector_angles(weights @ channel_map.directions[rows])
+        for (name, score), angle_deg, mag in zip(detected, angles.tolist(), magnitudes.tolist()):
+            if mag <= 0:
+                continue
+            detections.radar_dots.append((angle_deg, score, name, score))
+            if angle_deg < 0:
+                detections.left.append((name, score))
+            if angle_deg > 0:
+                detections.right.append((name, score))
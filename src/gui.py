@@ -4,7 +4,10 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QIcon
 import config
-from capturer import AudioCapturer
+from capturer import AudioCapturer, CAPTURE_RATE_MODES
+from channel_map import MAP_MODES, ANALYSIS_MODES
+
+MIN_MODEL_FRAMES = 16 # AST patch size; shorter inputs yield no time patches
 
 class SettingsWindow(QWidget):
     config_updated = pyqtSignal(dict)
@@ -27,11 +30,56 @@ class SettingsWindow(QWidget):
         model_layout = QVBoxLayout()
         
         # GPU Toggle
-        self.gpu_check = QCheckBox("Use GPU (Requires CUDA, Restart Required)")
+        self.gpu_check = QCheckBox("Use GPU (Requires CUDA)")
         self.gpu_check.setChecked(self.config["use_gpu"])
         self.gpu_check.stateChanged.connect(self.update_config)
         model_layout.addWidget(self.gpu_check)
         
+        # Inference Precision
+        precision_layout = QHBoxLayout()
+        precision_layout.addWidget(QLabel("Precision (Restart Required):"))
+        self.precision_combo = QComboBox()
+        self.precision_combo.addItems(["fp32", "bf16", "int8-dynamic"])
+        self.precision_combo.setCurrentText(self.config.get("precision", "fp32"))
+        self.precision_combo.currentTextChanged.connect(self.update_config)
+        precision_layout.addWidget(self.precision_combo)
+        model_layout.addLayout(precision_layout)
+        
+        # Inference Backend
+        backend_layout = QHBoxLayout()
+        backend_layout.addWidget(QLabel("Backend (Restart Required):"))
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItems(["pytorch", "onnxruntime"])
+        self.backend_combo.setCurrentText(self.config.get("backend", "pytorch"))
+        self.backend_combo.currentTextChanged.connect(self.update_config)
+        backend_layout.addWidget(self.backend_combo)
+        model_layout.addLayout(backend_layout)
+        
+        # Model Input Length (shorter than AST's 10 s skips padding)
+        frames_layout = QHBoxLayout()
+        frames_layout.addWidget(QLabel("Model Frames (Restart Required):"))
+        self.frames_spin = QSpinBox()
+        self.frames_spin.setRange(0, 1024)
+        self.frames_spin.setSingleStep(16)
+        self.frames_spin.setSpecialValueText("Full") # 0 = padded to 1024 frames
+        self.frames_spin.setKeyboardTracking(False) # snap typed values once, not per keystroke
+        self.frames_spin.setValue(self.config.get("max_frames", 0))
+        self.frames_spin.valueChanged.connect(self.snap_frames)
+        self.frames_spin.valueChanged.connect(self.update_config)
+        frames_layout.addWidget(self.frames_spin)
+        model_layout.addLayout(frames_layout)
+        
+        # Inference Threads (intra-op); 0 = library default (all cores)
+        threads_layout = QHBoxLayout()
+        threads_layout.addWidget(QLabel("CPU Threads (Restart Required):"))
+        self.threads_spin = QSpinBox()
+        self.threads_spin.setRange(0, 64)
+        self.threads_spin.setSpecialValueText("Auto")
+        self.threads_spin.setValue(self.config.get("intra_op_threads", 0))
+        self.threads_spin.valueChanged.connect(self.update_config)
+        threads_layout.addWidget(self.threads_spin)
+        model_layout.addLayout(threads_layout)
+        
         # Chunk Duration
         chunk_layout = QHBoxLayout()
         chunk_layout.addWidget(QLabel("Time Slice (s):"))
@@ -45,6 +93,19 @@ class SettingsWindow(QWidget):
         chunk_layout.addWidget(self.chunk_label)
         model_layout.addLayout(chunk_layout)
         
+        # Hop Size (sliding window)
+        hop_layout = QHBoxLayout()
+        hop_layout.addWidget(QLabel("Hop Size (s):"))
+        self.hop_slider = QSlider(Qt.Horizontal)
+        self.hop_slider.setRange(0, 60) # 0 = Off (disjoint slices), 0.05s to 3.0s in 0.05s steps
+        self.hop_slider.setValue(int(round(self.config.get("hop_duration", 0.0) * 20)))
+        self.hop_label = QLabel(self.format_hop(self.hop_slider.value()))
+        self.hop_slider.valueChanged.connect(lambda v: self.hop_label.setText(self.format_hop(v)))
+        self.hop_slider.valueChanged.connect(self.update_config)
+        hop_layout.addWidget(self.hop_slider)
+        hop_layout.addWidget(self.hop_label)
+        model_layout.addLayout(hop_layout)
+        
         # Top-K
         topk_layout = QHBoxLayout()
         topk_layout.addWidget(QLabel("Top-K Results:"))
@@ -68,6 +129,44 @@ class SettingsWindow(QWidget):
         conf_layout.addWidget(self.conf_label)
         model_layout.addLayout(conf_layout)
         
+        # Change Gate: unchanged channels reuse their last results
+        change_layout = QHBoxLayout()
+        change_layout.addWidget(QLabel("Change Gate (dB):"))
+        self.change_slider = QSlider(Qt.Horizontal)
+        self.change_slider.setRange(0, 120) # 0 = Off, 0.1 dB to 12.0 dB
+        self.change_slider.setValue(int(round(self.config.get("change_threshold_db", 4.0) * 10)))
+        self.change_label = QLabel(self.format_tenths(self.change_slider.value()))
+        self.change_slider.valueChanged.connect(lambda v: self.change_label.setText(self.format_tenths(v)))
+        self.change_slider.valueChanged.connect(self.update_config)
+        change_layout.addWidget(self.change_slider)
+        change_layout.addWidget(self.change_label)
+        model_layout.addLayout(change_layout)
+        
+        # Probability smoothing time constants: attack applies while a class rises, release while it falls
+        attack_layout = QHBoxLayout()
+        attack_layout.addWidget(QLabel("Smoothing Attack (s):"))
+        self.attack_slider = QSlider(Qt.Horizontal)
+        self.attack_slider.setRange(0, 50) # 0 = Off, 0.1s to 5.0s
+        self.attack_slider.setValue(int(round(self.config.get("smoothing_attack_time", 0.0) * 10)))
+        self.attack_label = QLabel(self.format_tenths(self.attack_slider.value()))
+        self.attack_slider.valueChanged.connect(lambda v: self.attack_label.setText(self.format_tenths(v)))
+        self.attack_slider.valueChanged.connect(self.update_config)
+        attack_layout.addWidget(self.attack_slider)
+        attack_layout.addWidget(self.attack_label)
+        model_layout.addLayout(attack_layout)
+        
+        release_layout = QHBoxLayout()
+        release_layout.addWidget(QLabel("Smoothing Release (s):"))
+        self.release_slider = QSlider(Qt.Horizontal)
+        self.release_slider.setRange(0, 100) # 0 = Off, 0.1s to 10.0s
+        self.release_slider.setValue(int(round(self.config.get("smoothing_release_time", 3.5) * 10)))
+        self.release_label = QLabel(self.format_tenths(self.release_slider.value()))
+        self.release_slider.valueChanged.connect(lambda v: self.release_label.setText(self.format_tenths(v)))
+        self.release_slider.valueChanged.connect(self.update_config)
+        release_layout.addWidget(self.release_slider)
+        release_layout.addWidget(self.release_label)
+        model_layout.addLayout(release_layout)
+        
         model_group.setLayout(model_layout)
         layout.addWidget(model_group)
         
@@ -94,21 +193,35 @@ class SettingsWindow(QWidget):
         device_layout.addWidget(self.device_combo)
         audio_layout.addLayout(device_layout)
 
+        # Capture Sample Rate
+        rate_layout = QHBoxLayout()
+        rate_layout.addWidget(QLabel("Capture Rate (Restart Required):"))
+        self.rate_combo = QComboBox()
+        self.rate_combo.addItems(CAPTURE_RATE_MODES)
+        self.rate_combo.setCurrentText(self.config.get("capture_rate", "Auto"))
+        self.rate_combo.currentTextChanged.connect(self.update_config)
+        rate_layout.addWidget(self.rate_combo)
+        audio_layout.addLayout(rate_layout)
+
         # Channel Mapping
         map_layout = QHBoxLayout()
         map_layout.addWidget(QLabel("Channel Map:"))
         self.map_combo = QComboBox()
-        self.map_combo.addItems([
-            "Standard", 
-            "Alternative (C/LFE Last)", 
-            "Side 5.1", 
-            "VB-Cable (Fix Back->Front)",
-            "7.1 (Side/Back Swapped)"
-        ])
+        self.map_combo.addItems(MAP_MODES)
         self.map_combo.setCurrentText(self.config.get("channel_map", "Standard"))
         self.map_combo.currentTextChanged.connect(self.update_config)
         map_layout.addWidget(self.map_combo)
         audio_layout.addLayout(map_layout)
+
+        # Analysis Mode
+        analysis_layout = QHBoxLayout()
+        analysis_layout.addWidget(QLabel("Analysis Mode:"))
+        self.analysis_combo = QComboBox()
+        self.analysis_combo.addItems(ANALYSIS_MODES)
+        self.analysis_combo.setCurrentText(self.config.get("analysis_mode", "Per-Channel"))
+        self.analysis_combo.currentTextChanged.connect(self.update_config)
+        analysis_layout.addWidget(self.analysis_combo)
+        audio_layout.addLayout(analysis_layout)
         
         # Normalization
         self.norm_check = QCheckBox("Enable Normalization")
@@ -200,6 +313,16 @@ class SettingsWindow(QWidget):
         size_layout.addWidget(self.size_label)
         display_layout.addLayout(size_layout)
 
+        # Overlay animation frame rate (independent of the inference rate)
+        fps_layout = QHBoxLayout()
+        fps_layout.addWidget(QLabel("Overlay FPS:"))
+        self.fps_spin = QSpinBox()
+        self.fps_spin.setRange(5, 144)
+        self.fps_spin.setValue(self.config.get("overlay_fps", 30))
+        self.fps_spin.valueChanged.connect(self.update_config)
+        fps_layout.addWidget(self.fps_spin)
+        display_layout.addLayout(fps_layout)
+
         self.debug_check = QCheckBox("Show Debug Info")
         self.debug_check.setChecked(self.config["show_debug"])
         self.debug_check.stateChanged.connect(self.update_config)
@@ -213,6 +336,8 @@ class SettingsWindow(QWidget):
         perf_layout = QVBoxLayout()
         self.perf_label = QLabel("Latency: N/A")
         perf_layout.addWidget(self.perf_label)
+        self.startup_label = QLabel("Startup: N/A")
+        perf_layout.addWidget(self.startup_label)
         perf_group.setLayout(perf_layout)
         layout.addWidget(perf_group)
         
@@ -240,14 +365,35 @@ class SettingsWindow(QWidget):
         self.tray_icon.setContextMenu(tray_menu)
         self.tray_icon.show()
 
+    @staticmethod
+    def format_tenths(value):
+        return "Off" if value == 0 else f"{value/10:.1f}"
+
+    @staticmethod
+    def format_hop(value):
+        return "Off" if value == 0 else f"{value/20:.2f}"
+
+    def snap_frames(self, value):
+        # Anything shorter than one patch is not a valid input length; 0 stays "Full"
+        if 0 < value < MIN_MODEL_FRAMES:
+            self.frames_spin.setValue(MIN_MODEL_FRAMES)
+
     def toggle_norm_slider(self, state):
         self.norm_slider.setEnabled(state == Qt.Checked)
 
     def update_config(self, *args):
         self.config["use_gpu"] = self.gpu_check.isChecked()
+        self.config["precision"] = self.precision_combo.currentText()
+        self.config["backend"] = self.backend_combo.currentText()
+        self.config["max_frames"] = self.frames_spin.value()
+        self.config["intra_op_threads"] = self.threads_spin.value()
         self.config["chunk_duration"] = self.chunk_slider.value() / 10.0
+        self.config["hop_duration"] = self.hop_slider.value() / 20.0
         self.config["top_k"] = self.topk_spin.value()
         self.config["confidence_threshold"] = self.conf_slider.value() / 100.0
+        self.config["change_threshold_db"] = self.change_slider.value() / 10.0
+        self.config["smoothing_attack_time"] = self.attack_slider.value() / 10.0
+        self.config["smoothing_release_time"] = self.release_slider.value() / 10.0
         self.config["enable_radar"] = self.radar_check.isChecked()
         self.config["normalize_audio"] = self.norm_check.isChecked()
         self.config["normalization_threshold"] = self.norm_slider.value() / 1000.0
@@ -255,7 +401,9 @@ class SettingsWindow(QWidget):
         self.config["show_debug"] = self.debug_check.isChecked()
         self.config["show_channel_levels"] = self.levels_check.isChecked()
         self.config["audio_device"] = self.device_combo.currentData()
+        self.config["capture_rate"] = self.rate_combo.currentText()
         self.config["channel_map"] = self.map_combo.currentText()
+        self.config["analysis_mode"] = self.analysis_combo.currentText()
         
         # Get checked radio button text
         checked_btn = self.pos_group.checkedButton()
@@ -263,14 +411,24 @@ class SettingsWindow(QWidget):
             self.config["radar_position"] = checked_btn.text()
             
         self.config["radar_size"] = self.size_slider.value()
+        self.config["overlay_fps"] = self.fps_spin.value()
         
         self.config_updated.emit(self.config)
 
     def save_settings(self):
         config.save_config(self.config)
 
-    def update_performance(self, latency):
-        self.perf_label.setText(f"Latency: {latency*1000:.1f} ms")
+    def update_performance(self, latency, reused=False):
+        # latency is the last real inference; reused chunks skipped the model
+        self.perf_label.setText(f"Latency: {latency*1000:.1f} ms" + (" (reused)" if reused else ""))
+
+    def update_startup(self, metrics):
+        parts = []
+        if "time_to_window" in metrics:
+            parts.append(f"window {metrics['time_to_window']:.2f} s")
+        if "time_to_first_prediction" in metrics:
+            parts.append(f"first prediction {metrics['time_to_first_prediction']:.2f} s")
+        self.startup_label.setText("Startup: " + " | ".join(parts))
 
     def quit_application(self):
         self.save_settings()
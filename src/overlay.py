@@ -1,221 +1,314 @@
-from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget, QHBoxLayout, QGridLayout, QSizePolicy
-from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QPoint
-from PyQt5.QtGui import QFont, QColor, QPalette, QPainter, QPen, QBrush
+from PyQt5.QtWidgets import QApplication, QLabel, QWidget
+from PyQt5.QtCore import Qt, QObject, QTimer, QPoint, QRect
+from PyQt5.QtGui import QFont, QColor, QPainter, QPen, QBrush, QPixmap, QStaticText, QFontMetrics
 import math
+import time
+from engine import DisplaySnapshot, SnapshotMailbox
 
 class RadarWidget(QWidget):
+    # Pens, brushes and fonts are built once instead of per paint
+    BORDER_PEN = QPen(QColor(0, 255, 255, 100), 2)
+    GRID_PEN = QPen(QColor(0, 255, 255, 50), 1)
+    BACKGROUND_BRUSH = QBrush(QColor(0, 0, 0, 150))
+    LEVEL_PEN = QPen(QColor(0, 255, 0, 200), 4)
+    LABEL_PEN = QPen(Qt.white)
+    DOT_BRUSHES = (QBrush(QColor(0, 255, 0)), QBrush(QColor(255, 255, 0)), QBrush(QColor(255, 0, 0))) # Green, Yellow, Red
+    DOT_RADIUS = 8
+    MAX_BAR_LEN = 20
+    MOTION_TIME = 0.15 # Seconds for a dot to cover ~63% of the way to its target
+    FADE_TIME = 0.25 # Seconds for a label to fade ~63% in or out
+
     def __init__(self, parent=None, size=300):
         super().__init__(parent)
         self.setFixedSize(size, size)
-        self.dots = [] # List of (angle, distance, label, confidence)
+        self.dots = [] # List of (angle, distance, label, confidence, alpha) as drawn
+        self._tracks = {} # label -> [angle, distance, confidence, alpha, target angle, target distance, target confidence, target alpha]
         self.channel_levels = [] # List of (angle, level)
         self.mode = 'semi' # 'semi' or 'full'
 
+        self.label_font = QFont("Arial", 10)
+        self.label_ascent = QFontMetrics(self.label_font).ascent()
+        self._labels = {} # label -> QStaticText
+        self._background = None # QPixmap of the static radar for _background_key
+        self._background_key = None # (mode, width, height, device pixel ratio)
+        self._dirty = QRect() # area covered by the dots/labels drawn last
+        self._full_repaint = False
+
     def set_size(self, size):
         self.setFixedSize(size, size)
+        self._background = None
         self.update()
 
-    def update_dots(self, dots, mode='semi', channel_levels=None):
-        self.dots = dots
+    def set_targets(self, dots, mode='semi', channel_levels=None):
+        # New detections become targets; step() moves the drawn dots towards them
+        self._full_repaint |= mode != self.mode or bool(channel_levels) or bool(self.channel_levels)
+        if mode != self.mode:
+            self._tracks.clear() # Angles mean different things per mode
         self.mode = mode
         if channel_levels is not None:
             self.channel_levels = channel_levels
         else:
             self.channel_levels = []
-        self.update()
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
+        for track in self._tracks.values():
+            track[7] = 0.0 # Fade out unless detected again
+        for angle_val, dist_val, label, conf in dots:
+            track = self._tracks.get(label)
+            if track is None:
+                # New labels appear at their position and fade in
+                self._tracks[label] = [angle_val, dist_val, conf, 0.0, angle_val, dist_val, conf, 1.0]
+            else:
+                track[4:] = [angle_val, dist_val, conf, 1.0]
+
+    def step(self, dt):
+        # Advance the animation by dt seconds and repaint what moved.
+        # Returns True while dots are still moving or fading.
+        move = 1 - math.exp(-dt / self.MOTION_TIME)
+        fade = 1 - math.exp(-dt / self.FADE_TIME)
+        animating = False
+        for label, track in list(self._tracks.items()):
+            angle_delta = track[4] - track[0]
+            if self.mode == 'full':
+                angle_delta = (angle_delta + 180) % 360 - 180 # Shortest way around
+            track[0] += angle_delta * move
+            track[1] += (track[5] - track[1]) * move
+            track[2] += (track[6] - track[2]) * move
+            track[3] += (track[7] - track[3]) * fade
+
+            if track[7] == 0.0 and track[3] < 0.02:
+                del self._tracks[label]
+                continue
+            if abs(angle_delta) > 0.01 or abs(track[5] - track[1]) > 0.002 or abs(track[7] - track[3]) > 0.02:
+                animating = True
+            else:
+                track[:4] = track[4:] # Snap once settled
+        self.dots = [(t[0], t[1], label, t[2], t[3]) for label, t in self._tracks.items()]
+
+        if self._full_repaint:
+            self._full_repaint = False
+            self.update()
+            return animating
+        # Only the areas of the old and new dots need repainting
+        dirty = self._dirty.united(self.dots_rect())
+        if not dirty.isEmpty():
+            self.update(dirty)
+        return animating
+
+    def radar_geometry(self):
+        # Radar center and radius for the current mode and size
+        if self.mode == 'semi':
+            center = QPoint(self.width() // 2, self.height())
+            radius = min(self.width() // 2, self.height()) - 20
+        else:
+            center = QPoint(self.width() // 2, self.height() // 2)
+            radius = min(self.width(), self.height()) // 2 - 20
+        return center, radius
+
+    def background(self):
+        # Static pie/circle and grid, rendered once per mode and size
+        ratio = self.devicePixelRatioF()
+        key = (self.mode, self.width(), self.height(), ratio)
+        if self._background is not None and self._background_key == key:
+            return self._background
+
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing)
-        
-        # Draw Radar Background
-        center = QPoint(self.width() // 2, self.height()) if self.mode == 'semi' else QPoint(self.width() // 2, self.height() // 2)
-        radius = (min(self.width() // 2, self.height()) - 20) if self.mode == 'semi' else (min(self.width(), self.height()) // 2 - 20)
-        
-        painter.setPen(QPen(QColor(0, 255, 255, 100), 2))
-        painter.setBrush(QBrush(QColor(0, 0, 0, 150)))
-        
+        center, radius = self.radar_geometry()
+
+        painter.setPen(self.BORDER_PEN)
+        painter.setBrush(self.BACKGROUND_BRUSH)
+
         if self.mode == 'semi':
             # Draw semi-circle
             painter.drawPie(center.x() - radius, center.y() - radius, radius * 2, radius * 2, 0, 180 * 16)
-            
+
             # Draw grid lines
-            painter.setPen(QPen(QColor(0, 255, 255, 50), 1))
+            painter.setPen(self.GRID_PEN)
             painter.drawPie(center.x() - radius//2, center.y() - radius//2, radius, radius, 0, 180 * 16)
             painter.drawLine(center, QPoint(center.x() - int(radius * math.cos(math.pi/4)), center.y() - int(radius * math.sin(math.pi/4))))
             painter.drawLine(center, QPoint(center.x() + int(radius * math.cos(math.pi/4)), center.y() - int(radius * math.sin(math.pi/4))))
         else:
             # Draw full circle
             painter.drawEllipse(center, radius, radius)
-            
+
             # Draw grid lines
-            painter.setPen(QPen(QColor(0, 255, 255, 50), 1))
+            painter.setPen(self.GRID_PEN)
             painter.drawEllipse(center, radius//2, radius//2)
             painter.drawLine(center.x() - radius, center.y(), center.x() + radius, center.y())
             painter.drawLine(center.x(), center.y() - radius, center.x(), center.y() + radius)
+        painter.end()
+
+        self._background = pixmap
+        self._background_key = key
+        return pixmap
+
+    def static_label(self, label):
+        text = self._labels.get(label)
+        if text is None:
+            text = QStaticText(label)
+            text.setTextFormat(Qt.PlainText)
+            text.prepare(font=self.label_font)
+            self._labels[label] = text
+        return text
+
+    def dot_position(self, angle_val, dist_val, center, radius):
+        # 'semi': angle_val is -1 (Left) to 1 (Right), 0 is Center.
+        # 'full': angle_val is degrees, 0 is Front (Up), 90 Right, 180 Back, -90 Left.
+        r = dist_val * radius
+        if self.mode == 'semi':
+            angle_rad = (1 - angle_val) * (math.pi / 2)
+            x = center.x() + r * math.cos(angle_rad)
+            y = center.y() - r * math.sin(angle_rad)
+        else:
+            # Screen Y is down: x = r * sin(theta), y = -r * cos(theta)
+            angle_rad = math.radians(angle_val)
+            x = center.x() + r * math.sin(angle_rad)
+            y = center.y() - r * math.cos(angle_rad)
+        return int(x), int(y)
+
+    def dots_rect(self):
+        # Bounding box of the dots and their labels
+        center, radius = self.radar_geometry()
+        rect = QRect()
+        for angle_val, dist_val, label, conf, alpha in self.dots:
+            x, y = self.dot_position(angle_val, dist_val, center, radius)
+            size = self.static_label(label).size()
+            rect = rect.united(QRect(x - self.DOT_RADIUS - 1, y - self.DOT_RADIUS - 1, self.DOT_RADIUS * 2 + 2, self.DOT_RADIUS * 2 + 2))
+            rect = rect.united(QRect(x + 10, y - self.label_ascent, int(size.width()) + 2, int(size.height()) + 2))
+        return rect
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        # Static background from the cache, only the exposed area
+        painter.drawPixmap(event.rect(), self.background(), event.rect())
+        center, radius = self.radar_geometry()
 
         # Draw Channel Levels
         if self.channel_levels:
-            painter.setPen(QPen(QColor(0, 255, 0, 200), 4))
-            max_bar_len = 20
-            
+            painter.setPen(self.LEVEL_PEN)
+
             for angle_deg, level in self.channel_levels:
-                # Convert angle to radians for drawing
-                # Angle 0 is Up (North), 90 is Right.
-                # Math: x = sin(theta), y = -cos(theta)
-                
+                # Angle 0 is Up (North), 90 is Right: x = sin(theta), y = -cos(theta)
                 # Clamp level
                 level = min(max(level, 0), 1.0)
-                bar_len = level * max_bar_len
-                
+                bar_len = level * self.MAX_BAR_LEN
+
                 if bar_len < 1: continue
-                
+
                 rad = math.radians(angle_deg)
-                
+
                 # Start point on circle edge
                 start_x = center.x() + radius * math.sin(rad)
                 start_y = center.y() - radius * math.cos(rad)
-                
+
                 # End point outwards
                 end_x = center.x() + (radius + bar_len) * math.sin(rad)
                 end_y = center.y() - (radius + bar_len) * math.cos(rad)
-                
+
                 painter.drawLine(QPoint(int(start_x), int(start_y)), QPoint(int(end_x), int(end_y)))
 
         # Draw Dots
-        for angle_val, dist_val, label, conf in self.dots:
-            # angle_val is [-1, 1]. 
-            # In 'semi' mode: -1 is Left (180 deg), 1 is Right (0 deg), 0 is Center (90 deg)
-            # In 'full' mode: angle_val is radians? Or degrees? Let's use degrees for simplicity in main.py and convert here.
-            # Actually, let's standardize: angle_val is always in degrees, 0 is Front/Right?
-            # Let's stick to the previous convention for semi: -1 to 1.
-            # For full, let's use degrees: 0 is Front, 90 Right, 180 Back, -90 Left.
-            
-            if self.mode == 'semi':
-                angle_rad = (1 - angle_val) * (math.pi / 2)
-            else:
-                # Full mode: angle_val is degrees. 0 is North (Up).
-                # Screen coords: Y is down.
-                # 0 deg (Front) -> Up -> (0, -r)
-                # 90 deg (Right) -> Right -> (r, 0)
-                # 180 deg (Back) -> Down -> (0, r)
-                # -90 deg (Left) -> Left -> (-r, 0)
-                # Math: x = r * sin(theta), y = -r * cos(theta)
-                angle_rad = math.radians(angle_val)
-                
-            # Distance
-            r = dist_val * radius
-            
-            if self.mode == 'semi':
-                x = center.x() + r * math.cos(angle_rad)
-                y = center.y() - r * math.sin(angle_rad)
-            else:
-                x = center.x() + r * math.sin(angle_rad)
-                y = center.y() - r * math.cos(angle_rad)
-            
+        self._dirty = QRect()
+        painter.setFont(self.label_font)
+        for angle_val, dist_val, label, conf, alpha in self.dots:
+            x, y = self.dot_position(angle_val, dist_val, center, radius)
+            painter.setOpacity(alpha)
+
             # Color based on confidence
-            if conf > 0.7:
-                color = QColor(0, 255, 0) # Green
-            elif conf > 0.4:
-                color = QColor(255, 255, 0) # Yellow
-            else:
-                color = QColor(255, 0, 0) # Red
-                
+            brush = self.DOT_BRUSHES[0] if conf > 0.7 else self.DOT_BRUSHES[1] if conf > 0.4 else self.DOT_BRUSHES[2]
             painter.setPen(Qt.NoPen)
-            painter.setBrush(QBrush(color))
-            painter.drawEllipse(QPoint(int(x), int(y)), 8, 8)
-            
-            # Draw Label
-            painter.setPen(QPen(Qt.white))
-            painter.setFont(QFont("Arial", 10))
-            painter.drawText(int(x) + 10, int(y), label)
+            painter.setBrush(brush)
+            painter.drawEllipse(QPoint(x, y), self.DOT_RADIUS, self.DOT_RADIUS)
 
+            # Draw Label (baseline at the dot's center, like drawText)
+            text = self.static_label(label)
+            painter.setPen(self.LABEL_PEN)
+            painter.drawStaticText(x + 10, y - self.label_ascent, text)
 
-class OverlayWindow(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("Sound Assistant Overlay")
-        
-        # Window flags for transparency and overlay
-        self.setWindowFlags(
-            Qt.FramelessWindowHint | 
-            Qt.WindowStaysOnTopHint | 
-            Qt.Tool |
-            Qt.WindowTransparentForInput # Click-through
-        )
-        self.setAttribute(Qt.WA_TranslucentBackground)
-        
-        # Full screen
-        screen = QApplication.primaryScreen().geometry()
-        self.setGeometry(screen)
-        
-        # Layout
-        central_widget = QWidget()
-        self.setCentralWidget(central_widget)
-        
-        # Main Layout (Grid Layout for better positioning)
-        self.main_layout = QGridLayout(central_widget)
-        self.main_layout.setContentsMargins(50, 20, 50, 50)
-        
-        # Configure Grid Rows/Cols
-        # Row 0: Top, Row 1: Middle (Expand), Row 2: Bottom
-        # Col 0: Left, Col 1: Center, Col 2: Right
-        self.main_layout.setRowStretch(0, 0)
-        self.main_layout.setRowStretch(1, 1)
-        self.main_layout.setRowStretch(2, 0)
-        self.main_layout.setColumnStretch(0, 1)
-        self.main_layout.setColumnStretch(1, 1)
-        self.main_layout.setColumnStretch(2, 1)
+        painter.setOpacity(1.0)
+        self._dirty = self.dots_rect()
+
+
+# Every overlay element is its own small click-through, stay-on-top window, so the
+# compositor only blends the pixels that are actually drawn
+OVERLAY_FLAGS = (
+    Qt.FramelessWindowHint | 
+    Qt.WindowStaysOnTopHint | 
+    Qt.Tool |
+    Qt.WindowTransparentForInput # Click-through
+)
+
+# Distance from the screen edges (left, top, right, bottom)
+OVERLAY_MARGINS = (50, 20, 50, 50)
+
+def make_overlay(widget):
+    widget.setWindowFlags(OVERLAY_FLAGS)
+    widget.setAttribute(Qt.WA_TranslucentBackground)
+    widget.setAttribute(Qt.WA_ShowWithoutActivating)
+    return widget
+
+def make_label(font, style, alignment):
+    label = make_overlay(QLabel(""))
+    label.setWindowTitle("Sound Assistant Overlay")
+    label.setFont(font)
+    label.setStyleSheet(style)
+    label.setAlignment(alignment)
+    return label
+
+def place(widget, position):
+    # Move a top-level element to one of the screen anchors, e.g. "Bottom Center"
+    screen = QApplication.primaryScreen().geometry()
+    left, top, right, bottom = OVERLAY_MARGINS
+    width, height = widget.width(), widget.height()
+    
+    vertical, _, horizontal = position.partition(" ")
+    if horizontal == "Left":
+        x = screen.left() + left
+    elif horizontal == "Right":
+        x = screen.right() + 1 - right - width
+    else:
+        x = screen.left() + (screen.width() - width) // 2
         
-        # Debug Label (Top Center - Row 0, Col 1)
-        debug_container = QWidget()
-        debug_container.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Preferred)
-        debug_layout = QVBoxLayout(debug_container)
-        debug_layout.setContentsMargins(0, 0, 0, 0)
-        debug_layout.setAlignment(Qt.AlignTop | Qt.AlignHCenter)
+    if vertical == "Top":
+        y = screen.top() + top
+    elif vertical == "Bottom":
+        y = screen.bottom() + 1 - bottom - height
+    else:
+        y = screen.top() + (screen.height() - height) // 2
         
-        self.debug_label = QLabel("")
-        self.debug_label.setFont(QFont("Consolas", 10))
-        self.debug_label.setStyleSheet("color: yellow; background-color: rgba(0, 0, 0, 150); padding: 5px;")
-        self.debug_label.setAlignment(Qt.AlignHCenter)
-        self.debug_label.setVisible(False)
-        debug_layout.addWidget(self.debug_label)
-        self.main_layout.addWidget(debug_container, 0, 1)
+    if widget.pos() != QPoint(x, y):
+        widget.move(x, y)
+
+class OverlayWindow(QObject):
+    def __init__(self):
+        super().__init__()
         
-        # Left Panel (Middle Left - Row 1, Col 0)
-        left_container = QWidget()
-        left_container.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Preferred)
-        left_layout = QVBoxLayout(left_container)
-        left_layout.setContentsMargins(0, 0, 0, 0)
-        left_layout.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        # Debug Label (Top Center)
+        self.debug_label = make_label(QFont("Consolas", 10), "color: yellow; background-color: rgba(0, 0, 0, 150); padding: 5px;", Qt.AlignHCenter)
         
-        self.left_label = QLabel("")
-        self.left_label.setFont(QFont("Arial", 24, QFont.Bold))
-        self.left_label.setStyleSheet("color: cyan; background-color: rgba(0, 0, 0, 100); padding: 10px; border-radius: 10px;")
-        self.left_label.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-        self.left_label.setVisible(False)
-        left_layout.addWidget(self.left_label)
-        self.main_layout.addWidget(left_container, 1, 0)
+        # Left Panel (Middle Left)
+        self.left_label = make_label(QFont("Arial", 24, QFont.Bold), "color: cyan; background-color: rgba(0, 0, 0, 100); padding: 10px; border-radius: 10px;", Qt.AlignLeft | Qt.AlignVCenter)
         
-        # Right Panel (Middle Right - Row 1, Col 2)
-        right_container = QWidget()
-        right_container.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Preferred)
-        right_layout = QVBoxLayout(right_container)
-        right_layout.setContentsMargins(0, 0, 0, 0)
-        right_layout.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        # Right Panel (Middle Right)
+        self.right_label = make_label(QFont("Arial", 24, QFont.Bold), "color: cyan; background-color: rgba(0, 0, 0, 100); padding: 10px; border-radius: 10px;", Qt.AlignRight | Qt.AlignVCenter)
         
-        self.right_label = QLabel("")
-        self.right_label.setFont(QFont("Arial", 24, QFont.Bold))
-        self.right_label.setStyleSheet("color: cyan; background-color: rgba(0, 0, 0, 100); padding: 10px; border-radius: 10px;")
-        self.right_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
-        self.right_label.setVisible(False)
-        right_layout.addWidget(self.right_label)
-        self.main_layout.addWidget(right_container, 1, 2)
+        self.label_positions = {
+            self.debug_label: "Top Center",
+            self.left_label: "Middle Left",
+            self.right_label: "Middle Right",
+        }
         
-        # Radar (Initially Bottom Center - Row 2, Col 1)
-        self.radar = RadarWidget()
-        self.radar.setVisible(False)
-        self.main_layout.addWidget(self.radar, 2, 1, Qt.AlignBottom | Qt.AlignHCenter)
+        # Radar (Initially Bottom Center)
+        self.radar = make_overlay(RadarWidget())
+        self.radar.setWindowTitle("Sound Assistant Radar")
+        self.radar_position = "Bottom Center"
+        self.radar_enabled = False
+        self.shown = False
         
         # Timer to clear text if no update
         self.clear_timer = QTimer()
@@ -223,76 +316,104 @@ class OverlayWindow(QMainWindow):
         self.clear_timer.start(3000) # Clear after 3 seconds of no updates
         
         self.current_radar_mode = 'semi'
+        
+        # Animation clock, independent of the inference rate.
+        # The worker posts snapshots to the mailbox; frames apply the latest one and animate the radar.
+        self.mailbox = SnapshotMailbox()
+        self.displayed = DisplaySnapshot() # last applied snapshot, for diffing
+        self.last_frame = time.perf_counter()
+        self.frame_timer = QTimer()
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.timeout.connect(self.render_frame)
+        self.set_frame_rate(30)
+
+    def show(self):
+        # Labels appear with their first text; only the radar is shown up front
+        self.shown = True
+        place(self.radar, self.radar_position)
+        self.radar.setVisible(self.radar_enabled)
+
+    def set_frame_rate(self, fps):
+        self.frame_timer.setInterval(max(1, int(1000 / max(1, fps))))
+
+    def request_frame(self):
+        # The clock only runs while there is something to show or animate
+        if not self.frame_timer.isActive():
+            self.last_frame = time.perf_counter()
+            self.frame_timer.start()
+
+    def render_frame(self):
+        now = time.perf_counter()
+        dt = min(now - self.last_frame, 0.25)
+        self.last_frame = now
+        
+        snapshot = self.mailbox.take()
+        if snapshot is not None:
+            self.apply_display(snapshot)
+            # Reset clear timer
+            self.clear_timer.start(3000)
+            
+        animating = False
+        if self.radar.isVisible():
+            animating = self.radar.step(dt)
+        if not animating:
+            self.frame_timer.stop()
 
     def update_layout_params(self, position, size):
-        # Update Radar Size
         # Update Radar Size
         self.radar.set_size(size)
         
         # Update Radar Position
-        # Remove radar from layout and re-add with correct alignment
-        self.main_layout.removeWidget(self.radar)
-        
-        row, col = 2, 1 # Default Bottom Center
-        alignment = Qt.AlignBottom | Qt.AlignHCenter
-        
-        if position == "Top Left":
-            row, col = 0, 0
-            alignment = Qt.AlignTop | Qt.AlignLeft
-        elif position == "Top Center":
-            row, col = 0, 1
-            alignment = Qt.AlignTop | Qt.AlignHCenter
-        elif position == "Top Right":
-            row, col = 0, 2
-            alignment = Qt.AlignTop | Qt.AlignRight
-        elif position == "Bottom Left":
-            row, col = 2, 0
-            alignment = Qt.AlignBottom | Qt.AlignLeft
-        elif position == "Bottom Center":
-            row, col = 2, 1
-            alignment = Qt.AlignBottom | Qt.AlignHCenter
-        elif position == "Bottom Right":
-            row, col = 2, 2
-            alignment = Qt.AlignBottom | Qt.AlignRight
-            
-        self.main_layout.addWidget(self.radar, row, col, alignment)
+        self.radar_position = position
+        place(self.radar, position)
+
+    def set_label(self, label, text):
+        if not text or not self.shown:
+            label.setVisible(False)
+            return
+        label.setText(text)
+        label.adjustSize() # Window hugs the text
+        place(label, self.label_positions[label])
+        label.setVisible(True)
 
-    def update_display(self, left_text, right_text, radar_dots=None, debug_info=None, radar_mode='semi', channel_levels=None):
-        self.current_radar_mode = radar_mode
+    def apply_display(self, snapshot):
+        # Only touch the widgets whose part of the snapshot changed
+        old = self.displayed
+        self.displayed = snapshot
+        self.current_radar_mode = snapshot.radar_mode
         
-        if left_text:
-            self.left_label.setText(left_text)
-            self.left_label.setVisible(True)
-            # self.left_label.adjustSize()
-        else:
-            self.left_label.setVisible(False)
-            
-        if right_text:
-            self.right_label.setText(right_text)
-            self.right_label.setVisible(True)
-            # self.right_label.adjustSize()
-        else:
-            self.right_label.setVisible(False)
+        if snapshot.left_text != old.left_text:
+            self.set_label(self.left_label, snapshot.left_text)
+        if snapshot.right_text != old.right_text:
+            self.set_label(self.right_label, snapshot.right_text)
             
-        if radar_dots is not None and self.radar.isVisible():
-            self.radar.update_dots(radar_dots, mode=radar_mode, channel_levels=channel_levels)
-            
-        if debug_info:
-            self.debug_label.setText(debug_info)
-            self.debug_label.setVisible(True)
-            # self.debug_label.adjustSize()
-        else:
-            self.debug_label.setVisible(False)
+        radar_changed = (snapshot.radar_dots != old.radar_dots or snapshot.radar_mode != old.radar_mode
+                         or snapshot.channel_levels != old.channel_levels)
+        if radar_changed and self.radar.isVisible():
+            self.radar.set_targets(snapshot.radar_dots, mode=snapshot.radar_mode, channel_levels=snapshot.channel_levels)
             
-        # Reset clear timer
-        self.clear_timer.start(3000)
+        if snapshot.debug_info != old.debug_info:
+            self.set_label(self.debug_label, snapshot.debug_info)
 
     def clear_display(self):
+        if self.mailbox.pending():
+            # A fresh snapshot arrived just before the timeout; show it instead
+            self.request_frame()
+            return
+        self.displayed = DisplaySnapshot(debug_info=self.displayed.debug_info, radar_mode=self.current_radar_mode)
         self.left_label.setVisible(False)
         self.right_label.setVisible(False)
-        self.radar.update_dots([], mode=self.current_radar_mode)
+        self.radar.set_targets([], mode=self.current_radar_mode)
+        self.request_frame() # Fade the dots out
         # Don't clear debug info immediately, or maybe yes?
         # self.debug_label.setVisible(False)
 
     def set_radar_enabled(self, enabled):
-        self.radar.setVisible(enabled)
+        self.radar_enabled = enabled
+        if self.shown:
+            place(self.radar, self.radar_position)
+            self.radar.setVisible(enabled)
+        if enabled:
+            # Dots are only diffed while the radar is visible, so resync it
+            self.radar.set_targets(self.displayed.radar_dots, mode=self.displayed.radar_mode, channel_levels=self.displayed.channel_levels)
+            self.request_frame()
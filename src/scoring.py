@@ -0,0 +1,13 @@
+import numpy as np
+
+# Score helpers shared by the classifier and the processing engine (no torch or Qt imports)
+
+def top_k_classes(probs, top_k):
+    # [rows, classes] -> (ids, scores) of the top_k classes per row, highest first
+    k = min(top_k, probs.shape[1])
+    if k <= 0:
+        return np.zeros((len(probs), 0), dtype=np.intp), np.zeros((len(probs), 0), dtype=probs.dtype)
+    ids = np.argpartition(probs, -k, axis=1)[:, -k:]
+    scores = np.take_along_axis(probs, ids, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)